@@ -0,0 +1,37 @@
+"""
+Compara ordenar tudo + paginar com a seleção parcial de services/topk.py
+numa coleção sintética grande (ex: python -m benchmarks.topk_bench 200000).
+"""
+import random
+import sys
+import time
+
+from services import topk
+
+
+def _bench(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main(size: int = 100_000) -> None:
+    rnd = random.Random(0)
+    items = [{"name": f"item-{rnd.randrange(size * 10):08d}", "population": rnd.randrange(10**9)} for _ in range(size)]
+
+    def key(it):
+        return (0, float(it["population"]))
+
+    print(f"{size} itens")
+    for page, limit in [(1, 10), (5, 50), (20, 50)]:
+        stop = page * limit
+        full = _bench(lambda: sorted(items, key=key, reverse=True)[stop - limit:stop])
+        partial = _bench(lambda: topk.sorted_prefix(items, key, True, stop)[stop - limit:stop])
+        print(f"page={page:>3} limit={limit:>3}  sorted: {full:8.2f} ms   top-k: {partial:8.2f} ms   ({full / partial:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
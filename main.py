@@ -1,16 +1,45 @@
 # main.py
+import asyncio
 import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 
+from routers.aggregate_router import aggregate_router
+from routers.autocomplete_router import autocomplete_router
 from routers.films_router import films_router
 from routers.people_router import people_router
 from routers.planets_router import planets_router
+from routers.search_unified import search_unified
 from routers.species_router import species_router
 from routers.starships_router import starships_router
+from routers.top_router import top_router
 from routers.vehicles_router import vehicles_router
+from services import cache, mirror, snapshot, swapi_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background: list[asyncio.Task] = []
+
+    # snapshot em disco primeiro: com ele o processo já sobe com cache/espelho aquecidos
+    restored = snapshot.load()
+    if mirror.MIRROR_ENABLED:
+        background.append(await mirror.start(crawl=not restored))
+    if snapshot.SNAPSHOT_PATH:
+        background.append(asyncio.create_task(snapshot.run_save_loop()))
+
+    yield
 
-app = FastAPI()
+    for task in background:
+        task.cancel()
+    snapshot.save()
+    # fecha o pool de conexões assíncronas do upstream
+    await swapi_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 @app.middleware("http")
 async def api_key_middleware(request: Request, call_next):
@@ -35,9 +64,25 @@ async def api_key_middleware(request: Request, call_next):
     return await call_next(request)
 
 
+@app.middleware("http")
+async def stale_marker_middleware(request: Request, call_next):
+    # Se alguma parte da resposta veio de um valor vencido do cache (upstream fora ou revalidando),
+    # o cliente fica sabendo pelos headers
+    stale = cache.begin_request()
+    response = await call_next(request)
+    if stale:
+        response.headers["Warning"] = '110 - "Response is Stale"'
+        response.headers["X-Cache"] = "STALE"
+    return response
+
+
 app.include_router(people_router)
 app.include_router(films_router)
 app.include_router(planets_router)
 app.include_router(species_router)
 app.include_router(vehicles_router)
-app.include_router(starships_router)
\ No newline at end of file
+app.include_router(starships_router)
+app.include_router(search_unified)
+app.include_router(autocomplete_router)
+app.include_router(aggregate_router)
+app.include_router(top_router)
@@ -0,0 +1,36 @@
+import time
+from typing import Literal
+
+from fastapi import APIRouter, Query
+
+from services import dataset
+
+aggregate_router = APIRouter(tags=["Aggregate"])
+
+
+@aggregate_router.get("/aggregate")
+async def aggregate(
+    resource: Literal["people", "films", "planets", "species", "starships", "vehicles"] = Query(...),
+    group_by: str | None = Query(None, description="Campo para agrupar (ex: gender, starship_class, species)"),
+    metrics: str = Query("count", description="Ex: count,avg:height,max:mass (count, sum, avg, min, max)"),
+    filter_: str | None = Query(None, alias="filter", description="Mesma sintaxe do `filter` das listagens"),
+):
+    """
+    Contagens e estatísticas por grupo, calculadas no servidor sobre as colunas tipadas da coleção
+    inteira. O resultado fica guardado até a próxima versão do dataset.
+    """
+    started_at = time.time()
+
+    collection = await dataset.aget(resource)
+    groups = collection.aggregate(group_by, metrics, filter_)
+
+    return {
+        "resource": resource,
+        "group_by": group_by,
+        "metrics": metrics,
+        "filter": filter_,
+        "version": collection.version,
+        "count": len(groups),
+        "groups": groups,
+        "elapsed_ms": int((time.time() - started_at) * 1000),
+    }
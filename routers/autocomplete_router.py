@@ -0,0 +1,42 @@
+import heapq
+import time
+from typing import Literal
+
+from fastapi import APIRouter, Query
+
+from services import dataset, known_ids, popularity
+
+autocomplete_router = APIRouter(tags=["Autocomplete"])
+
+
+@autocomplete_router.get("/autocomplete")
+async def autocomplete(
+    resource: Literal["people", "films", "planets", "species", "starships", "vehicles"] = Query(...),
+    prefix: str = Query(..., min_length=1, description="Início de alguma palavra do name/title"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """
+    Sugestões para digitação: itens com alguma palavra do name/title começando por `prefix`,
+    dos mais acessados (rotas de detalhe) para os menos. Servido do índice de prefixos da coleção.
+    """
+    started_at = time.time()
+    field = "title" if resource == "films" else "name"
+
+    collection = await dataset.aget(resource)
+    matches = []
+    for pos in collection.prefix_index.search(prefix):
+        item = collection.items[pos]
+        item_id = known_ids.id_from_url(item.get("url"))
+        matches.append((-popularity.hits(resource, item_id), str(item.get(field) or "").lower(), pos, item_id))
+    # só os `limit` primeiros precisam sair ordenados
+    matches = heapq.nsmallest(limit, matches)
+
+    return {
+        "resource": resource,
+        "prefix": prefix,
+        "results": [
+            {"id": item_id, field: collection.items[pos].get(field), "url": collection.items[pos].get("url")}
+            for _, _, pos, item_id in matches
+        ],
+        "elapsed_ms": int((time.time() - started_at) * 1000),
+    }
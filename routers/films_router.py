@@ -1,39 +1,17 @@
 import time
+from collections.abc import Sequence
 from typing import Any, Literal
 
-import requests
 from fastapi import APIRouter, HTTPException, Query
 
-films_router = APIRouter(prefix="/films", tags=["Films"])
-SWAPI_BASE_URL = "https://swapi.dev/api"
-
-_CACHE: dict[str, tuple[float, Any]] = {}
-CACHE_TTL_SECONDS = 60
-
-
-def _get_json_cached(url: str, ttl: int = CACHE_TTL_SECONDS) -> Any:
-    now = time.time()
+from services import cache, dataset, fieldsets, filters, known_ids, mirror, pagination, popularity, swapi_client, topk
+from services.mirror import Collection
+from services.swapi_client import SWAPI_BASE_URL
 
-    cached = _CACHE.get(url)
-    if cached:
-        expires_at, value = cached
-        if now < expires_at:
-            return value
-        _CACHE.pop(url, None)
-
-    try:
-        resp = requests.get(url, timeout=10)
-    except requests.RequestException:
-        raise HTTPException(status_code=502, detail="Upstream request failed")
-
-    if resp.status_code == 404:
-        raise HTTPException(status_code=404, detail="Resource not found")
-    if resp.status_code >= 400:
-        raise HTTPException(status_code=502, detail="Upstream returned error")
+films_router = APIRouter(prefix="/films", tags=["Films"])
 
-    data = resp.json()
-    _CACHE[url] = (now + ttl, data)
-    return data
+# Campos aceitos em `sort`; a ordem de cada um é pré-calculada na ingestão da coleção
+_ALLOWED_SORT_FIELDS = {"title", "release_date", "episode_id", "director"}
 
 
 def _split_csv(value: str | None) -> set[str]:
@@ -45,26 +23,22 @@ def _split_csv(value: str | None) -> set[str]:
 def _normalize_str(v: Any) -> str:
     return str(v or "").strip().lower()
 
-def _apply_local_filter(items: list[dict], q: str | None, field: str = "name") -> list[dict]:
-    if not q:
-        return items
 
-    q_norm = q.strip().lower()
-    if not q_norm:
-        return items
+def _sort_key(value: Any):
+    return (value is None, str(value).lower() if value is not None else "")
+
+
+mirror.register_sort_keys("films", _ALLOWED_SORT_FIELDS, _sort_key)
+
 
-    out: list[dict] = []
-    for it in items:
-        value = it.get(field)
-        if isinstance(value, str) and q_norm in value.lower():
-            out.append(it)
-    return out
 def _apply_sort(
     items: list[dict[str, Any]],
     sort: str | None,
     order: Literal["asc", "desc"],
     allowed_fields: set[str],
-) -> list[dict[str, Any]]:
+    collection: Collection,
+    stop: int | None = None,
+) -> Sequence[dict[str, Any]]:
     if not sort:
         return items
 
@@ -76,24 +50,26 @@ def _apply_sort(
 
     reverse = order == "desc"
 
-    def key_fn(x: dict[str, Any]):
-        value = x.get(sort)
-        return (value is None, str(value).lower() if value is not None else "")
+    if items is collection.items:
+        # coleção inteira: permutação pré-calculada na ingestão, a página vira só um recorte
+        return collection.ordered(sort, _sort_key, reverse)
+    # subconjunto filtrado: a chave é o posto do item, pré-calculado na coleção;
+    # só os `stop` primeiros precisam sair ordenados
+    rank = collection.rank(sort, _sort_key)
+    return topk.sorted_prefix(items, lambda x: rank[collection.position(x)], reverse, stop)
 
-    return sorted(items, key=key_fn, reverse=reverse)
 
+async def _fetch_many(urls: list[str]) -> dict[str, Any]:
+    unique = list(dict.fromkeys(u for u in urls if isinstance(u, str)))
+    values = await swapi_client.gather_limited(cache.aget_json_cached(u) for u in unique)
+    return dict(zip(unique, values))
 
-def _paginate(items: list[dict[str, Any]], page: int, limit: int) -> list[dict[str, Any]]:
-    start = (page - 1) * limit
-    end = start + limit
-    return items[start:end]
 
+def _lookup(related: dict[str, Any], urls: list[str]) -> list[dict[str, Any]]:
+    return [related[u] for u in urls if u in related]
 
-def _fetch_many(urls: list[str]) -> list[dict[str, Any]]:
-    return [_get_json_cached(u) for u in urls if isinstance(u, str)]
 
-
-def _pick_species(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+def _pick_species(items: list[dict[str, Any]], related: dict[str, Any]) -> list[dict[str, Any]]:
     specie = []
 
     for item in items:
@@ -103,9 +79,8 @@ def _pick_species(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
         homeworld_name = None
         homeworld_url = item.get("homeworld")
 
-        if homeworld_url:
-            homeworld_data = _get_json_cached(homeworld_url)
-            homeworld_name = homeworld_data.get("name")
+        if homeworld_url in related:
+            homeworld_name = related[homeworld_url].get("name")
 
         specie.append({
             "name": item.get("name"),
@@ -161,7 +136,7 @@ def _pick_planet(items: list[dict[str, Any]]) -> list[dict[str,Any]]:
 
     return planet
 
-def _pick_people(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+def _pick_people(items: list[dict[str, Any]], related: dict[str, Any]) -> list[dict[str, Any]]:
     people = []
 
     for item in items:
@@ -171,9 +146,8 @@ def _pick_people(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
         homeworld_name = None
         homeworld_url = item.get("homeworld")
 
-        if homeworld_url:
-            homeworld_data = _get_json_cached(homeworld_url)
-            homeworld_name = homeworld_data.get("name")
+        if homeworld_url in related:
+            homeworld_name = related[homeworld_url].get("name")
 
         people.append({
             "name": item.get("name"),
@@ -183,69 +157,108 @@ def _pick_people(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
 
     return people
 
-def _expand_film(film: dict[str, Any], expand: set[str]) -> dict[str, Any]:
+def _relation_urls(film: dict[str, Any], expand: set[str]) -> list[str]:
+    urls: list[str] = []
+    for field in ("characters", "planets", "starships", "vehicles", "species"):
+        if field in expand:
+            urls.extend(film.get(field) or [])
+    return urls
+
+
+def _expand_film(film: dict[str, Any], expand: set[str], related: dict[str, Any]) -> dict[str, Any]:
     expanded = dict(film)
 
     if "characters" in expand:
-        characters = _fetch_many(film.get("characters") or [])
-        expanded["characters"] = _pick_people(characters)
+        expanded["characters"] = _pick_people(_lookup(related, film.get("characters") or []), related)
 
     if "planets" in expand:
-        planets = _fetch_many(film.get("planets") or [])
-        expanded["planets"] = _pick_planet(planets)
+        expanded["planets"] = _pick_planet(_lookup(related, film.get("planets") or []))
 
     if "starships" in expand:
-        starships = _fetch_many(film.get("starships") or [])
-        expanded["starships"] = _pick_starships(starships)
+        expanded["starships"] = _pick_starships(_lookup(related, film.get("starships") or []))
 
     if "vehicles" in expand:
-        vehicles = _fetch_many(film.get("vehicles") or [])
-        expanded["vehicles"] = _pick_vehicles(vehicles)
+        expanded["vehicles"] = _pick_vehicles(_lookup(related, film.get("vehicles") or []))
 
     if "species" in expand:
-        species = _fetch_many(film.get("species") or [])
-        expanded["species"] = _pick_species(species)
+        expanded["species"] = _pick_species(_lookup(related, film.get("species") or []), related)
 
     return expanded
 
 
+async def _expand_films(
+    films: list[dict[str, Any]], expand: set[str], fieldset: fieldsets.FieldSet | None
+) -> list[dict[str, Any]]:
+    """Resolve todos os relacionamentos da resposta em paralelo e só depois monta cada filme."""
+    related = await _fetch_many([u for f in films for u in _relation_urls(f, expand)])
+
+    # characters e species têm homeworld como segundo nível, buscado também em lote (só se `fields` o pede)
+    nested_fields = [
+        field for field in ("characters", "species")
+        if field in expand and fieldsets.wants(fieldset, f"{field}.homeworld")
+    ]
+    if nested_fields:
+        items = _lookup(related, [u for f in films for field in nested_fields for u in f.get(field) or []])
+        nested = [it.get("homeworld") for it in items]
+        related.update(await _fetch_many([u for u in nested if u not in related]))
+
+    return [_expand_film(f, expand, related) for f in films]
+
+
 @films_router.get("/")
-def all_films(
+async def all_films(
     q: str | None = Query(None, description="Search by title (contains, case-insensitive)"),
+    fuzzy: bool = Query(False, description="Tolera erros de digitação em q e ordena por relevância"),
+    filter_: str | None = Query(None, alias="filter", description="Ex: episode_id>=4;director~lucas (ver README)"),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=50),
     sort: str | None = Query(None),
     order: Literal["asc", "desc"] = Query("asc"),
     expand: str | None = Query(None),
+    fields: str | None = Query(None, description="Ex: title,url,characters.name (só esses campos)"),
+    cursor: str | None = Query(None, description="next_cursor da página anterior (no lugar de page)"),
 ):
     started_at = time.time()
-    expand_set = _split_csv(expand)
-
-    allowed_sort_fields = {"title", "release_date", "episode_id", "director"}
-
-    base_url = f"{SWAPI_BASE_URL}/films/"
-    if q:
-        base_url += "?search=" + requests.utils.quote(q)
-
-    data = _get_json_cached(base_url)
-    collected = data.get("results", [])
-
-    filtered = _apply_local_filter(collected, q, "title")
-    sorted_items = _apply_sort(filtered, sort, order, allowed_sort_fields)
-    paged = _paginate(sorted_items, page, limit)
+    fieldset = fieldsets.parse(fields)
+    # relação que não aparece em `fields` nem é buscada
+    expand_set = fieldsets.restrict(_split_csv(expand), fieldset)
+
+    query = pagination.query_hash("films", q, fuzzy, filter_, sort, order)
+    resume = pagination.decode(cursor, query)
+
+    # poucos filmes: busca e ordenação sempre locais, sobre a coleção inteira já indexada
+    collection = await dataset.aget("films", resume.version if resume else None)
+    filtered = collection.search(q, fuzzy)
+    if filter_:
+        filtered = collection.where(filters.compile_filter(filter_), filtered)
+    paged, next_cursor = pagination.paginate(
+        collection,
+        filtered,
+        resume,
+        page,
+        limit,
+        query,
+        lambda stop: _apply_sort(filtered, sort, order, _ALLOWED_SORT_FIELDS, collection, stop=stop),
+        (sort, _sort_key, order == "desc") if sort else None,
+    )
 
     if expand_set:
-        paged = [_expand_film(f, expand_set) for f in paged]
+        paged = await _expand_films(paged, expand_set, fieldset)
+    paged = fieldsets.project(paged, fieldset)
 
     return {
         "resource": "films",
-        "count": len(sorted_items),
+        "count": len(filtered),
         "page": page,
         "limit": limit,
+        "next_cursor": next_cursor,
         "q": q,
+        "fuzzy": fuzzy,
+        "filter": filter_,
         "sort": sort,
         "order": order,
         "expand": sorted(expand_set),
+        "fields": fields,
         "time": round(time.time() - started_at, 3),
         "results": paged,
     }
@@ -255,11 +268,17 @@ def all_films(
 async def film_by_id(
     id: int,
     expand: str | None = Query(None),
+    fields: str | None = Query(None, description="Ex: title,url,characters.name (só esses campos)"),
 ):
-    expand_set = _split_csv(expand)
-    film = _get_json_cached(f"{SWAPI_BASE_URL}/films/{id}/")
+    fieldset = fieldsets.parse(fields)
+    # relação que não aparece em `fields` nem é buscada
+    expand_set = fieldsets.restrict(_split_csv(expand), fieldset)
+    known_ids.ensure_known("films", id)
+    film = await cache.aget_json_cached(f"{SWAPI_BASE_URL}/films/{id}/")
+    popularity.record("films", id)
 
     if expand_set:
-        film = _expand_film(film, expand_set)
+        film = (await _expand_films([film], expand_set, fieldset))[0]
+    film = fieldsets.project(film, fieldset)
 
-    return {"resource": "films", "id": id, "expand": sorted(expand_set), "result": film}
+    return {"resource": "films", "id": id, "expand": sorted(expand_set), "fields": fields, "result": film}
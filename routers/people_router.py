@@ -1,39 +1,23 @@
 import time
+from collections.abc import Sequence
 from typing import Any, Literal
 
-import requests
 from fastapi import APIRouter, HTTPException, Query
 
-people_router = APIRouter(prefix="/peoples", tags=["Peoples"])
-SWAPI_BASE_URL = "https://swapi.dev/api"
-
-_CACHE: dict[str, tuple[float, Any]] = {}
-CACHE_TTL_SECONDS = 60
-
-
-def _get_json_cached(url: str, ttl: int = CACHE_TTL_SECONDS) -> Any:
-    now = time.time()
-
-    cached = _CACHE.get(url)
-    if cached:
-        expires_at, value = cached
-        if now < expires_at:
-            return value
-        _CACHE.pop(url, None)
+from services import (
+    cache, columns, dataset, fieldsets, filters, known_ids, mirror, pagination, popularity,
+    swapi_client, topk,
+)
+from services.mirror import Collection
+from services.swapi_client import SWAPI_BASE_URL
 
-    try:
-        resp = requests.get(url, timeout=10)
-    except requests.RequestException:
-        raise HTTPException(status_code=502, detail="Upstream request failed")
-
-    if resp.status_code == 404:
-        raise HTTPException(status_code=404, detail="Resource not found")
-    if resp.status_code >= 400:
-        raise HTTPException(status_code=502, detail="Upstream returned error")
+people_router = APIRouter(prefix="/peoples", tags=["Peoples"])
 
-    data = resp.json()
-    _CACHE[url] = (now + ttl, data)
-    return data
+# Campos aceitos em `sort`; a ordem de cada um é pré-calculada na ingestão da coleção
+_ALLOWED_SORT_FIELDS = {"name", "height", "mass", "gender", "birth_year"}
+# Estes ordenam pelo valor numérico (colunas tipadas); unknown/n/a ficam depois dos números em asc
+# e, como desc é o inverso exato de asc, antes deles em desc
+_NUMERIC_SORT_FIELDS = {"height", "mass"}
 
 
 def _split_csv(value: str | None) -> set[str]:
@@ -46,27 +30,36 @@ def _normalize_str(v: Any) -> str:
     return str(v or "").strip().lower()
 
 
-def _apply_local_filter(items: list[dict], q: str | None, field: str = "name") -> list[dict]:
-    if not q:
-        return items
+def _sort_key(value: Any):
+    return (value is None, str(value).lower() if value is not None else "")
 
-    q_norm = q.strip().lower()
-    if not q_norm:
-        return items
 
-    out: list[dict] = []
-    for it in items:
-        value = it.get(field)
-        if isinstance(value, str) and q_norm in value.lower():
-            out.append(it)
-    return out
+def _key_for(field: str):
+    return columns.numeric_first if field in _NUMERIC_SORT_FIELDS else _sort_key
+
+
+mirror.register_sort_keys("people", _ALLOWED_SORT_FIELDS - _NUMERIC_SORT_FIELDS, _sort_key)
+mirror.register_sort_keys("people", _NUMERIC_SORT_FIELDS, columns.numeric_first)
+
+
+def _bmi(store: columns.ColumnStore) -> columns.NumericColumn:
+    # mass (kg) / altura (m)²; height vem em cm
+    height = store.numeric_column("height")
+    squared = columns.NumericColumn.from_arrays((height.values / 100) ** 2, height.valid)
+    return columns.ratio(store.numeric_column("mass"), squared)
+
+
+mirror.register_derived("people", "bmi", _bmi)
+
 
 def _apply_sort(
     items: list[dict[str, Any]],
     sort: str | None,
     order: Literal["asc", "desc"],
     allowed_fields: set[str],
-) -> list[dict[str, Any]]:
+    collection: Collection,
+    stop: int | None = None,
+) -> Sequence[dict[str, Any]]:
     if not sort:
         return items
 
@@ -78,21 +71,23 @@ def _apply_sort(
 
     reverse = order == "desc"
 
-    def key_fn(x: dict[str, Any]):
-        value = x.get(sort)
-        return (value is None, str(value).lower() if value is not None else "")
-
-    return sorted(items, key=key_fn, reverse=reverse)
+    if items is collection.items:
+        # coleção inteira: permutação pré-calculada na ingestão, a página vira só um recorte
+        return collection.ordered(sort, _key_for(sort), reverse)
+    # subconjunto filtrado: a chave é o posto do item, pré-calculado na coleção;
+    # só os `stop` primeiros precisam sair ordenados
+    rank = collection.rank(sort, _key_for(sort))
+    return topk.sorted_prefix(items, lambda x: rank[collection.position(x)], reverse, stop)
 
 
-def _paginate(items: list[dict[str, Any]], page: int, limit: int) -> list[dict[str, Any]]:
-    start = (page - 1) * limit
-    end = start + limit
-    return items[start:end]
+async def _fetch_many(urls: list[str]) -> dict[str, Any]:
+    unique = list(dict.fromkeys(u for u in urls if isinstance(u, str)))
+    values = await swapi_client.gather_limited(cache.aget_json_cached(u) for u in unique)
+    return dict(zip(unique, values))
 
 
-def _fetch_many(urls: list[str]) -> list[dict[str, Any]]:
-    return [_get_json_cached(u) for u in urls if isinstance(u, str)]
+def _lookup(related: dict[str, Any], urls: list[str]) -> list[dict[str, Any]]:
+    return [related[u] for u in urls if u in related]
 
 
 def _pick_films(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
@@ -126,7 +121,7 @@ def _pick_starships(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
     return out
 
 
-def _pick_species(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+def _pick_species(items: list[dict[str, Any]], related: dict[str, Any]) -> list[dict[str, Any]]:
     out = []
     for item in items:
         if not isinstance(item, dict):
@@ -134,9 +129,8 @@ def _pick_species(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
 
         homeworld_name = None
         homeworld_url = item.get("homeworld")
-        if homeworld_url:
-            homeworld_data = _get_json_cached(homeworld_url)
-            homeworld_name = homeworld_data.get("name")
+        if homeworld_url in related:
+            homeworld_name = related[homeworld_url].get("name")
 
         out.append({
             "name": item.get("name"),
@@ -147,104 +141,154 @@ def _pick_species(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
     return out
 
 
-def _pick_homeworld(url: str | None) -> dict[str, Any] | None:
-    if not url:
+def _pick_homeworld(data: dict[str, Any] | None) -> dict[str, Any] | None:
+    if not data:
         return None
-    data = _get_json_cached(url)
     return {"name": data.get("name"), "climate": data.get("climate"), "population": data.get("population")}
 
 
-def _expand_person(person: dict[str, Any], expand: set[str]) -> dict[str, Any]:
+def _relation_urls(person: dict[str, Any], expand: set[str]) -> list[str]:
+    urls: list[str] = []
+    for field in ("homeworld", "films", "vehicles", "starships", "species"):
+        if field not in expand:
+            continue
+        value = person.get(field)
+        if isinstance(value, str):
+            urls.append(value)
+        elif isinstance(value, list):
+            urls.extend(value)
+    return urls
+
+
+def _expand_person(person: dict[str, Any], expand: set[str], related: dict[str, Any]) -> dict[str, Any]:
     expanded = dict(person)
 
     if "homeworld" in expand:
-        expanded["homeworld"] = _pick_homeworld(person.get("homeworld"))
+        expanded["homeworld"] = _pick_homeworld(related.get(person.get("homeworld")))
 
     if "films" in expand:
-        films = _fetch_many(person.get("films") or [])
-        expanded["films"] = _pick_films(films)
+        expanded["films"] = _pick_films(_lookup(related, person.get("films") or []))
 
     if "vehicles" in expand:
-        vehicles = _fetch_many(person.get("vehicles") or [])
-        expanded["vehicles"] = _pick_vehicles(vehicles)
+        expanded["vehicles"] = _pick_vehicles(_lookup(related, person.get("vehicles") or []))
 
     if "starships" in expand:
-        starships = _fetch_many(person.get("starships") or [])
-        expanded["starships"] = _pick_starships(starships)
+        expanded["starships"] = _pick_starships(_lookup(related, person.get("starships") or []))
 
     if "species" in expand:
         species_urls = person.get("species") or []
         if not species_urls:
             expanded["species"] = [{"name": "Human"}]
         else:
-            species = _fetch_many(species_urls)
-            expanded["species"] = _pick_species(species)
+            expanded["species"] = _pick_species(_lookup(related, species_urls), related)
 
     return expanded
 
 
+async def _expand_people(
+    people: list[dict[str, Any]], expand: set[str], fieldset: fieldsets.FieldSet | None
+) -> list[dict[str, Any]]:
+    """Resolve todos os relacionamentos da resposta em paralelo e só depois monta cada pessoa."""
+    related = await _fetch_many([u for p in people for u in _relation_urls(p, expand)])
+
+    if "species" in expand and fieldsets.wants(fieldset, "species.homeworld"):
+        # homeworld de cada species é um segundo nível, buscado também em lote (só se `fields` o pede)
+        species = _lookup(related, [u for p in people for u in p.get("species") or []])
+        nested = [sp.get("homeworld") for sp in species]
+        related.update(await _fetch_many([u for u in nested if u not in related]))
+
+    return [_expand_person(p, expand, related) for p in people]
+
+
 @people_router.get("/")
-def all_people(
+async def all_people(
     q: str | None = Query(None, description="Search by name (contains, case-insensitive)"),
+    fuzzy: bool = Query(False, description="Tolera erros de digitação em q e ordena por relevância"),
+    filter_: str | None = Query(None, alias="filter", description="Ex: height>180;gender=male (ver README)"),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=50),
     sort: str | None = Query(None),
     order: Literal["asc", "desc"] = Query("asc"),
     expand: str | None = Query(None),
+    fields: str | None = Query(None, description="Ex: name,url,homeworld.name (só esses campos)"),
+    cursor: str | None = Query(None, description="next_cursor da página anterior (no lugar de page)"),
 ):
     started_at = time.time()
-    expand_set = _split_csv(expand)
-
-    allowed_sort_fields = {"name", "height", "mass", "gender", "birth_year"}
+    fieldset = fieldsets.parse(fields)
+    # relação que não aparece em `fields` nem é buscada
+    expand_set = fieldsets.restrict(_split_csv(expand), fieldset)
 
-    target = page * limit
     base_url = f"{SWAPI_BASE_URL}/people/"
-    if q:
-        base_url += "?search=" + requests.utils.quote(q)
-
-    collected: list[dict[str, Any]] = []
-    next_url: str | None = base_url
-    pages = 0
-
-    while next_url and len(collected) < target and pages < 10:
-        data = _get_json_cached(next_url)
-        collected.extend(data.get("results", []))
-        next_url = data.get("next")
-        pages += 1
 
-    filtered = _apply_local_filter(collected, q, "name")
-    sorted_items = _apply_sort(filtered, sort, order, allowed_sort_fields)
-    paged = _paginate(sorted_items, page, limit)
+    query = pagination.query_hash("people", q, fuzzy, filter_, sort, order)
+    resume = pagination.decode(cursor, query)
+
+    if resume is not None or mirror.get("people") is not None or q or sort or filter_:
+        # busca e ordenação locais, sobre a coleção inteira (índice de n-gramas montado na ingestão);
+        # com cursor, sobre a mesma versão da coleção que gerou a página anterior
+        collection = await dataset.aget("people", resume.version if resume else None)
+        filtered = collection.search(q, fuzzy)
+        if filter_:
+            filtered = collection.where(filters.compile_filter(filter_), filtered)
+        paged, next_cursor = pagination.paginate(
+            collection,
+            filtered,
+            resume,
+            page,
+            limit,
+            query,
+            lambda stop: _apply_sort(filtered, sort, order, _ALLOWED_SORT_FIELDS, collection, stop=stop),
+            (sort, _key_for(sort), order == "desc") if sort else None,
+        )
+        count = len(filtered)
+    else:
+        # só as páginas do upstream que cobrem o intervalo pedido
+        start = (page - 1) * limit
+        paged, count = await swapi_client.acollect(base_url, cache.aget_page_cached, start, start + limit)
+        next_cursor = pagination.next_upstream_cursor(query, start, len(paged), count)
 
     if expand_set:
-        paged = [_expand_person(p, expand_set) for p in paged]
+        paged = await _expand_people(paged, expand_set, fieldset)
     else:
-        for p in paged:
-            if not p.get("species"):
-                p["species"] = [{"name": "Human"}]
+        # cópia: os registros vêm do cache compartilhado e não podem ser alterados
+        paged = [p if p.get("species") else {**p, "species": [{"name": "Human"}]} for p in paged]
+    paged = fieldsets.project(paged, fieldset)
 
     return {
         "resource": "people",
-        "count": len(sorted_items),
+        "count": count,
         "page": page,
         "limit": limit,
+        "next_cursor": next_cursor,
         "q": q,
+        "fuzzy": fuzzy,
+        "filter": filter_,
         "sort": sort,
         "order": order,
         "expand": sorted(expand_set),
+        "fields": fields,
         "time": round(time.time() - started_at, 3),
         "results": paged,
     }
 
 
 @people_router.get("/{id}")
-async def people_by_id(id: int, expand: str | None = Query(None)):
-    expand_set = _split_csv(expand)
-    person = _get_json_cached(f"{SWAPI_BASE_URL}/people/{id}/")
+async def people_by_id(
+    id: int,
+    expand: str | None = Query(None),
+    fields: str | None = Query(None, description="Ex: name,url,homeworld.name (só esses campos)"),
+):
+    fieldset = fieldsets.parse(fields)
+    # relação que não aparece em `fields` nem é buscada
+    expand_set = fieldsets.restrict(_split_csv(expand), fieldset)
+    known_ids.ensure_known("people", id)
+    person = await cache.aget_json_cached(f"{SWAPI_BASE_URL}/people/{id}/")
+    popularity.record("people", id)
 
     if expand_set:
-        person = _expand_person(person, expand_set)
+        person = (await _expand_people([person], expand_set, fieldset))[0]
     elif not person.get("species"):
-        person["species"] = [{"name": "Human"}]
+        person = {**person, "species": [{"name": "Human"}]}
+    person = fieldsets.project(person, fieldset)
 
-    return {"resource": "people", "id": id, "expand": sorted(expand_set), "result": person}
+    return {"resource": "people", "id": id, "expand": sorted(expand_set), "fields": fields, "result": person}
@@ -1,40 +1,13 @@
-import time
+from collections.abc import Sequence
 from typing import Any, Literal
 
-import requests
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Query
 
-search_unified = APIRouter(tags=["Search"])
-
-SWAPI_BASE_URL = "https://swapi.dev/api"
-
-_CACHE: dict[str, tuple[float, Any]] = {}
-CACHE_TTL_SECONDS = 60
-
-
-def _get_json_cached(url: str, ttl: int = CACHE_TTL_SECONDS) -> Any:
-    now = time.time()
+from services import cache, dataset, fieldsets, mirror, pagination, swapi_client, topk
+from services.mirror import Collection
+from services.swapi_client import SWAPI_BASE_URL
 
-    cached = _CACHE.get(url)
-    if cached:
-        expires_at, value = cached
-        if now < expires_at:
-            return value
-        _CACHE.pop(url, None)
-
-    try:
-        resp = requests.get(url, timeout=10)
-    except requests.RequestException:
-        raise HTTPException(status_code=502, detail="Upstream request failed")
-
-    if resp.status_code == 404:
-        raise HTTPException(status_code=404, detail="Resource not found")
-    if resp.status_code >= 400:
-        raise HTTPException(status_code=502, detail="Upstream returned error")
-
-    data = resp.json()
-    _CACHE[url] = (now + ttl, data)
-    return data
+search_unified = APIRouter(tags=["Search"])
 
 
 def _split_csv(value: str | None) -> list[str]:
@@ -43,94 +16,98 @@ def _split_csv(value: str | None) -> list[str]:
     return [v.strip() for v in value.split(",") if v.strip()]
 
 
-def _normalize_str(v: Any) -> str:
-    return str(v or "").strip().lower()
+def _sort_key(val: Any):
+    if val is None:
+        return (1, "")
+    return (0, str(val).lower())
 
 
-def _apply_local_filter(results: list[dict[str, Any]], q: str | None) -> list[dict[str, Any]]:
-    """Filtra localmente por 'name' ou 'title' contendo q (case-insensitive)."""
-    if not q:
-        return results
-
-    needle = _normalize_str(q)
-    filtered: list[dict[str, Any]] = []
-    for item in results:
-        hay = _normalize_str(item.get("name") or item.get("title"))
-        if needle in hay:
-            filtered.append(item)
-    return filtered
-
-
-def _apply_sort(results: list[dict[str, Any]], sort: str | None, order: Literal["asc", "desc"]) -> list[dict[str, Any]]:
+def _apply_sort(
+    results: list[dict[str, Any]],
+    sort: str | None,
+    order: Literal["asc", "desc"],
+    collection: Collection,
+    stop: int | None = None,
+) -> Sequence[dict[str, Any]]:
     """Ordena localmente por campo (se existir)."""
     if not sort:
         return results
 
     reverse = order == "desc"
 
-    def key_fn(x: dict[str, Any]):
-        val = x.get(sort)
-        if val is None:
-            return (1, "")
-        return (0, str(val).lower())
-
-    return sorted(results, key=key_fn, reverse=reverse)
-
-
-def _paginate(results: list[dict[str, Any]], page: int, limit: int) -> list[dict[str, Any]]:
-    start = (page - 1) * limit
-    end = start + limit
-    return results[start:end]
-
+    if results is collection.items:
+        # coleção inteira: permutação calculada uma vez por coleção e campo
+        return collection.ordered(sort, _sort_key, reverse)
+    # subconjunto filtrado: a chave é o posto do item, pré-calculado na coleção;
+    # só os `stop` primeiros precisam sair ordenados
+    rank = collection.rank(sort, _sort_key)
+    return topk.sorted_prefix(results, lambda x: rank[collection.position(x)], reverse, stop)
+
+
+_EXPAND_MAP: dict[str, dict[str, str]] = {
+    "people": {
+        "homeworld": "homeworld",
+        "films": "films",
+        "starships": "starships",
+        "vehicles": "vehicles",
+        "species": "species",
+    },
+    "films": {
+        "characters": "characters",
+        "planets": "planets",
+        "starships": "starships",
+        "vehicles": "vehicles",
+        "species": "species",
+    },
+    "planets": {
+        "residents": "residents",
+        "films": "films",
+    },
+    "starships": {
+        "pilots": "pilots",
+        "films": "films",
+    },
+    "vehicles": {
+        "pilots": "pilots",
+        "films": "films",
+    },
+}
+
+
+async def _fetch_many(urls: list[str]) -> dict[str, Any]:
+    unique = list(dict.fromkeys(u for u in urls if isinstance(u, str) and u.startswith("http")))
+    values = await swapi_client.gather_limited(cache.aget_json_cached(u) for u in unique)
+    return dict(zip(unique, values))
+
+
+def _relation_urls(resource: str, item: dict[str, Any], expand: set[str]) -> list[str]:
+    allowed = _EXPAND_MAP.get(resource, {})
+    urls: list[str] = []
+    for key in expand:
+        field = allowed.get(key)
+        if not field:
+            continue
 
-def _fetch_many(urls: list[str]) -> list[dict[str, Any]]:
-    out: list[dict[str, Any]] = []
-    for u in urls:
-        if isinstance(u, str) and u.startswith("http"):
-            out.append(_get_json_cached(u))
-    return out
+        value = item.get(field)
+        if isinstance(value, str):
+            urls.append(value)
+        elif isinstance(value, list):
+            urls.extend(value)
+    return urls
 
 
-def _expand_item(resource: str, item: dict[str, Any], expand: set[str]) -> dict[str, Any]:
+def _expand_item(resource: str, item: dict[str, Any], expand: set[str], related: dict[str, Any]) -> dict[str, Any]:
     """
     Expand simples e útil (correlacionados) para SWAPI.
     - people: homeworld, films, starships, vehicles, species
     - films: characters, planets, starships, vehicles, species
     - planets: residents, films
     - starships/vehicles: pilots, films
+    `related` já vem com todos os correlacionados buscados (ver _relation_urls).
     """
     expanded = dict(item)
 
-    expand_map: dict[str, dict[str, str]] = {
-        "people": {
-            "homeworld": "homeworld",
-            "films": "films",
-            "starships": "starships",
-            "vehicles": "vehicles",
-            "species": "species",
-        },
-        "films": {
-            "characters": "characters",
-            "planets": "planets",
-            "starships": "starships",
-            "vehicles": "vehicles",
-            "species": "species",
-        },
-        "planets": {
-            "residents": "residents",
-            "films": "films",
-        },
-        "starships": {
-            "pilots": "pilots",
-            "films": "films",
-        },
-        "vehicles": {
-            "pilots": "pilots",
-            "films": "films",
-        },
-    }
-
-    allowed = expand_map.get(resource, {})
+    allowed = _EXPAND_MAP.get(resource, {})
     for key in expand:
         field = allowed.get(key)
         if not field:
@@ -139,9 +116,9 @@ def _expand_item(resource: str, item: dict[str, Any], expand: set[str]) -> dict[
         value = item.get(field)
 
         if isinstance(value, str) and value.startswith("http"):
-            expanded[key] = _get_json_cached(value)
+            expanded[key] = related.get(value)
         elif isinstance(value, list):
-            expanded[key] = _fetch_many(value)
+            expanded[key] = [related[u] for u in value if u in related]
 
     return expanded
 
@@ -150,65 +127,70 @@ def _expand_item(resource: str, item: dict[str, Any], expand: set[str]) -> dict[
 async def search(
     resource: Literal["people", "planets", "films", "starships", "vehicles"] = Query(...),
     q: str | None = Query(None, description="Busca por name/title (contains, case-insensitive)"),
+    fuzzy: bool = Query(False, description="Tolera erros de digitação em q e ordena por relevância"),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=50),
     sort: str | None = Query(None, description="Campo para ordenar (ex: name, title, release_date)"),
     order: Literal["asc", "desc"] = Query("asc"),
     expand: str | None = Query(None, description="CSV de correlacionados (ex: homeworld,films)"),
+    fields: str | None = Query(None, description="Ex: name,url,homeworld.name (só esses campos)"),
+    cursor: str | None = Query(None, description="next_cursor da página anterior (no lugar de page)"),
 ):
     """
     Endpoint unificado:
-    - Consulta SWAPI usando endpoint do recurso
-    - Aplica filtro local adicional (q)
+    - Busca local por name/title (q), no índice de n-gramas da coleção
     - Ordena localmente (sort/order)
-    - Pagina localmente (page/limit)
+    - Pagina localmente (page/limit ou cursor)
     - Expande correlacionados (expand=...)
+    - Devolve só os campos pedidos (fields=...); relação fora de `fields` nem é buscada
     """
-    expand_set = set(_split_csv(expand))
+    fieldset = fieldsets.parse(fields)
+    expand_set = fieldsets.restrict(set(_split_csv(expand)), fieldset)
 
-    target_count = page * limit
     swapi_url = f"{SWAPI_BASE_URL}/{resource}/"
 
-    params = {}
-    if q:
-        params["search"] = q
-
-    if params:
-        swapi_url = swapi_url + "?" + "&".join(f"{k}={requests.utils.quote(str(v))}" for k, v in params.items())
-
-    collected: list[dict[str, Any]] = []
-    next_url: str | None = swapi_url
-
-    max_pages = 10
-    pages = 0
-
-    while next_url and len(collected) < target_count and pages < max_pages:
-        data = _get_json_cached(next_url)
-        results = data.get("results", [])
-        if not isinstance(results, list):
-            break
-
-        collected.extend(results)
-        next_url = data.get("next")
-        pages += 1
-
-    filtered = _apply_local_filter(collected, q)
-
-    sorted_results = _apply_sort(filtered, sort, order)
-
-    paged = _paginate(sorted_results, page, limit)
+    query = pagination.query_hash(resource, q, fuzzy, None, sort, order)
+    resume = pagination.decode(cursor, query)
+
+    if resume is not None or mirror.get(resource) is not None or q or sort:
+        # busca e ordenação locais, sobre a coleção inteira (índice de n-gramas montado na ingestão);
+        # com cursor, sobre a mesma versão da coleção que gerou a página anterior
+        collection = await dataset.aget(resource, resume.version if resume else None)
+        filtered = collection.search(q, fuzzy)
+        paged, next_cursor = pagination.paginate(
+            collection,
+            filtered,
+            resume,
+            page,
+            limit,
+            query,
+            lambda stop: _apply_sort(filtered, sort, order, collection, stop=stop),
+            (sort, _sort_key, order == "desc") if sort else None,
+        )
+        count = len(filtered)
+    else:
+        # só as páginas do upstream que cobrem o intervalo pedido
+        start = (page - 1) * limit
+        paged, count = await swapi_client.acollect(swapi_url, cache.aget_page_cached, start, start + limit)
+        next_cursor = pagination.next_upstream_cursor(query, start, len(paged), count)
 
     if expand_set:
-        paged = [_expand_item(resource, item, expand_set) for item in paged]
+        # todos os correlacionados da página são buscados juntos, em paralelo
+        related = await _fetch_many([u for item in paged for u in _relation_urls(resource, item, expand_set)])
+        paged = [_expand_item(resource, item, expand_set, related) for item in paged]
+    paged = fieldsets.project(paged, fieldset)
 
     return {
         "resource": resource,
-        "count": len(sorted_results),
+        "count": count,
         "page": page,
         "limit": limit,
+        "next_cursor": next_cursor,
         "q": q,
+        "fuzzy": fuzzy,
         "sort": sort,
         "order": order,
         "expand": sorted(expand_set),
+        "fields": fields,
         "results": paged,
     }
@@ -0,0 +1,47 @@
+import time
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query
+
+from services import dataset, known_ids
+
+top_router = APIRouter(tags=["Top"])
+
+
+@top_router.get("/top")
+async def top(
+    resource: Literal["people", "films", "planets", "species", "starships", "vehicles"] = Query(...),
+    metric: str = Query(..., description="Campo numérico ou derivado (ex: max_atmosphering_speed, bmi)"),
+    order: Literal["asc", "desc"] = Query("desc", description="desc = maiores primeiro"),
+    limit: int = Query(10, ge=1, le=50),
+    filter_: str | None = Query(None, alias="filter", description="Mesma sintaxe do `filter` das listagens"),
+):
+    """
+    Os `limit` itens com maior (ou menor) valor em `metric`, numa chamada só. Itens sem valor
+    (unknown, n/a) ficam de fora. Derivados: bmi (people), cost_per_passenger (starships, vehicles).
+    """
+    started_at = time.time()
+    field = "title" if resource == "films" else "name"
+
+    collection = await dataset.aget(resource)
+    if metric not in collection.columns.numeric_fields:
+        raise HTTPException(status_code=400, detail="Invalid metric")
+    ranked = collection.top(metric, limit, reverse=order == "desc", filter_=filter_)
+
+    return {
+        "resource": resource,
+        "metric": metric,
+        "order": order,
+        "limit": limit,
+        "filter": filter_,
+        "results": [
+            {
+                "id": known_ids.id_from_url(collection.items[pos].get("url")),
+                field: collection.items[pos].get(field),
+                "url": collection.items[pos].get("url"),
+                metric: value,
+            }
+            for pos, value in ranked
+        ],
+        "elapsed_ms": int((time.time() - started_at) * 1000),
+    }
@@ -1,40 +1,20 @@
 import time
+from collections.abc import Sequence
 from typing import Any, Literal
 
-import requests
 from fastapi import APIRouter, HTTPException, Query
 
-vehicles_router = APIRouter(prefix="/vehicles", tags=["Vehicles"])
-SWAPI_BASE_URL = "https://swapi.dev/api"
-
-_CACHE: dict[str, tuple[float, Any]] = {}
-CACHE_TTL_SECONDS = 60
-
-
-def _get_json_cached(url: str, ttl: int = CACHE_TTL_SECONDS) -> Any:
-    now = time.time()
-
-    cached = _CACHE.get(url)
-    if cached:
-        expires_at, value = cached
-        if now < expires_at:
-            return value
-        else:
-            _CACHE.pop(url, None)
-
-    try:
-        resp = requests.get(url, timeout=10)
-    except requests.RequestException:
-        raise HTTPException(status_code=502, detail="Upstream request failed")
+from services import (
+    cache, columns, dataset, fieldsets, filters, known_ids, mirror, pagination, popularity,
+    swapi_client, topk,
+)
+from services.mirror import Collection
+from services.swapi_client import SWAPI_BASE_URL
 
-    if resp.status_code == 404:
-        raise HTTPException(status_code=404, detail="Resource not found")
-    if resp.status_code >= 400:
-        raise HTTPException(status_code=502, detail="Upstream returned error")
+vehicles_router = APIRouter(prefix="/vehicles", tags=["Vehicles"])
 
-    data = resp.json()
-    _CACHE[url] = (now + ttl, data)
-    return data
+# Campos aceitos em `sort`; a ordem de cada um é pré-calculada na ingestão da coleção
+_ALLOWED_SORT_FIELDS = {"name", "model", "manufacturer", "vehicle_class"}
 
 
 def _split_csv(value: str | None) -> set[str]:
@@ -43,25 +23,12 @@ def _split_csv(value: str | None) -> set[str]:
     return {v.strip() for v in value.split(",") if v.strip()}
 
 
-def _apply_local_filter(items: list[dict], q: str | None, field: str) -> list[dict]:
-    if not q:
-        return items
-    q_norm = q.strip().lower()
-    if not q_norm:
-        return items
-    out: list[dict] = []
-    for it in items:
-        v = it.get(field)
-        if isinstance(v, str) and q_norm in v.lower():
-            out.append(it)
-    return out
-
-
-def _try_float(v: Any) -> float | None:
-    try:
-        return float(v)
-    except (TypeError, ValueError):
-        return None
+mirror.register_sort_keys("vehicles", _ALLOWED_SORT_FIELDS, columns.numeric_first)
+mirror.register_derived(
+    "vehicles",
+    "cost_per_passenger",
+    lambda store: columns.ratio(store.numeric_column("cost_in_credits"), store.numeric_column("passengers")),
+)
 
 
 def _apply_sort(
@@ -69,7 +36,9 @@ def _apply_sort(
     sort: str | None,
     order: Literal["asc", "desc"],
     allowed: set[str],
-) -> list[dict]:
+    collection: Collection,
+    stop: int | None = None,
+) -> Sequence[dict]:
     if not sort:
         return items
     if sort not in allowed:
@@ -77,20 +46,13 @@ def _apply_sort(
 
     reverse = order == "desc"
 
-    def key_fn(it: dict):
-        val = it.get(sort)
-        num = _try_float(val)
-        if num is not None:
-            return (0, num)
-        return (1, str(val or "").strip().lower())
-
-    return sorted(items, key=key_fn, reverse=reverse)
-
-
-def _paginate(items: list[dict], page: int, limit: int) -> list[dict]:
-    start = (page - 1) * limit
-    end = start + limit
-    return items[start:end]
+    if items is collection.items:
+        # coleção inteira: permutação pré-calculada na ingestão, a página vira só um recorte
+        return collection.ordered(sort, columns.numeric_first, reverse)
+    # subconjunto filtrado: a chave é o posto do item, pré-calculado na coleção;
+    # só os `stop` primeiros precisam sair ordenados
+    rank = collection.rank(sort, columns.numeric_first)
+    return topk.sorted_prefix(items, lambda it: rank[collection.position(it)], reverse, stop)
 
 
 def _pick_people(data: dict) -> dict:
@@ -122,76 +84,104 @@ def _pick_vehicle(data: dict) -> dict:
     }
 
 
-def _expand_vehicle(data: dict, expand_set: set[str]) -> dict:
+def _fetch_many(urls: list[str]) -> dict[str, Any]:
+    unique = list(dict.fromkeys(urls))
+    return dict(zip(unique, swapi_client.map_limited(cache.get_json_cached, unique)))
+
+
+async def _afetch_many(urls: list[str]) -> dict[str, Any]:
+    unique = list(dict.fromkeys(urls))
+    values = await swapi_client.gather_limited(cache.aget_json_cached(u) for u in unique)
+    return dict(zip(unique, values))
+
+
+def _relation_urls(data: dict, expand_set: set[str]) -> list[str]:
+    urls: list[str] = []
+    for field in ("pilots", "films"):
+        if field in expand_set and isinstance(data.get(field), list):
+            urls.extend(u for u in data[field] if isinstance(u, str))
+    return urls
+
+
+def _expand_vehicle(data: dict, expand_set: set[str], related: dict[str, Any]) -> dict:
     expanded = dict(data)
 
     if "pilots" in expand_set and isinstance(expanded.get("pilots"), list):
-        expanded["pilots"] = [_pick_people(_get_json_cached(u)) for u in expanded["pilots"]]
+        expanded["pilots"] = [_pick_people(related[u]) for u in expanded["pilots"] if u in related]
 
     if "films" in expand_set and isinstance(expanded.get("films"), list):
-        expanded["films"] = [_pick_films(_get_json_cached(u)) for u in expanded["films"]]
+        expanded["films"] = [_pick_films(related[u]) for u in expanded["films"] if u in related]
 
     return expanded
 
 
 @vehicles_router.get("/")
-def all_vehicles(
+async def all_vehicles(
     q: str | None = Query(None),
+    fuzzy: bool = Query(False, description="Tolera erros de digitação em q e ordena por relevância"),
+    filter_: str | None = Query(None, alias="filter", description="Ex: passengers>=1;vehicle_class~speeder|walker (ver README)"),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=50),
     sort: str | None = Query(None),
     order: Literal["asc", "desc"] = Query("asc"),
     expand: str | None = Query(None),
+    fields: str | None = Query(None, description="Ex: name,url,pilots.name (só esses campos)"),
+    cursor: str | None = Query(None, description="next_cursor da página anterior (no lugar de page)"),
 ):
     started_at = time.time()
-    expand_set = _split_csv(expand)
-
-    allowed_sort_fields = {"name", "model", "manufacturer", "vehicle_class"}
-
-    target = page * limit
-    base_url_no_search = f"{SWAPI_BASE_URL}/vehicles/"
-    base_url = base_url_no_search
-    if q:
-        base_url += "?search=" + requests.utils.quote(q)
-
-    collected: list[dict[str, Any]] = []
-    next_url: str | None = base_url
-    pages = 0
-
-    while next_url and len(collected) < target and pages < 10:
-        data = _get_json_cached(next_url)
-        collected.extend(data.get("results", []))
-        next_url = data.get("next")
-        pages += 1
-
-    if q and not collected:
-        collected = []
-        next_url = base_url_no_search
-        pages = 0
-        while next_url and len(collected) < target and pages < 10:
-            data = _get_json_cached(next_url)
-            collected.extend(data.get("results", []))
-            next_url = data.get("next")
-            pages += 1
-
-    filtered = _apply_local_filter(collected, q, "name")
-    sorted_items = _apply_sort(filtered, sort, order, allowed_sort_fields)
-    paged = _paginate(sorted_items, page, limit)
+    fieldset = fieldsets.parse(fields)
+    # relação que não aparece em `fields` nem é buscada
+    expand_set = fieldsets.restrict(_split_csv(expand), fieldset)
+
+    base_url = f"{SWAPI_BASE_URL}/vehicles/"
+
+    query = pagination.query_hash("vehicles", q, fuzzy, filter_, sort, order)
+    resume = pagination.decode(cursor, query)
+
+    if resume is not None or mirror.get("vehicles") is not None or q or sort or filter_:
+        # busca e ordenação locais, sobre a coleção inteira (índice de n-gramas montado na ingestão);
+        # com cursor, sobre a mesma versão da coleção que gerou a página anterior
+        collection = await dataset.aget("vehicles", resume.version if resume else None)
+        filtered = collection.search(q, fuzzy)
+        if filter_:
+            filtered = collection.where(filters.compile_filter(filter_), filtered)
+        paged, next_cursor = pagination.paginate(
+            collection,
+            filtered,
+            resume,
+            page,
+            limit,
+            query,
+            lambda stop: _apply_sort(filtered, sort, order, _ALLOWED_SORT_FIELDS, collection, stop=stop),
+            (sort, columns.numeric_first, order == "desc") if sort else None,
+        )
+        count = len(filtered)
+    else:
+        # só as páginas do upstream que cobrem o intervalo pedido
+        start = (page - 1) * limit
+        paged, count = await swapi_client.acollect(base_url, cache.aget_page_cached, start, start + limit)
+        next_cursor = pagination.next_upstream_cursor(query, start, len(paged), count)
 
     if expand_set:
-        paged = [_expand_vehicle(p, expand_set) for p in paged]
+        related = await _afetch_many([u for p in paged for u in _relation_urls(p, expand_set)])
+        paged = [_expand_vehicle(p, expand_set, related) for p in paged]
     else:
         paged = [_pick_vehicle(p) for p in paged]
+    paged = fieldsets.project(paged, fieldset)
 
     return {
         "resource": "vehicles",
-        "count": len(filtered),
+        "count": count,
         "page": page,
         "limit": limit,
+        "next_cursor": next_cursor,
         "q": q,
+        "fuzzy": fuzzy,
+        "filter": filter_,
         "sort": sort,
         "order": order,
         "expand": sorted(expand_set) if expand_set else [],
+        "fields": fields,
         "results": paged,
         "elapsed_ms": int((time.time() - started_at) * 1000),
     }
@@ -201,21 +191,29 @@ def all_vehicles(
 def vehicle_by_id(
     vehicle_id: int,
     expand: str | None = Query(None),
+    fields: str | None = Query(None, description="Ex: name,url,pilots.name (só esses campos)"),
 ):
     started_at = time.time()
-    expand_set = _split_csv(expand)
+    fieldset = fieldsets.parse(fields)
+    # relação que não aparece em `fields` nem é buscada
+    expand_set = fieldsets.restrict(_split_csv(expand), fieldset)
 
-    data = _get_json_cached(f"{SWAPI_BASE_URL}/vehicles/{vehicle_id}/")
+    known_ids.ensure_known("vehicles", vehicle_id)
+    data = cache.get_json_cached(f"{SWAPI_BASE_URL}/vehicles/{vehicle_id}/")
+    popularity.record("vehicles", vehicle_id)
 
     if expand_set:
-        result = _expand_vehicle(data, expand_set)
+        related = _fetch_many(_relation_urls(data, expand_set))
+        result = _expand_vehicle(data, expand_set, related)
     else:
         result = _pick_vehicle(data)
+    result = fieldsets.project(result, fieldset)
 
     return {
         "resource": "vehicles",
         "id": vehicle_id,
         "expand": sorted(expand_set) if expand_set else [],
+        "fields": fields,
         "result": result,
         "elapsed_ms": int((time.time() - started_at) * 1000),
     }
@@ -0,0 +1,134 @@
+import re
+from functools import lru_cache
+from typing import Any
+
+import numpy as np
+from fastapi import HTTPException
+
+from services.columns import ColumnStore, json_number, normalize_text
+
+# Métricas aceitas em `metrics`: "count" (itens do grupo) ou "<função>:<campo numérico>"
+#   count,avg:height,max:mass   count:mass conta só os itens com mass preenchido
+METRICS = ("count", "sum", "avg", "min", "max")
+
+_METRIC_RE = re.compile(r"^\s*(count|sum|avg|min|max)\s*(?::\s*([A-Za-z_][A-Za-z0-9_]*))?\s*$")
+
+
+def _invalid(reason: str) -> HTTPException:
+    return HTTPException(status_code=400, detail=f"Invalid aggregate: {reason}")
+
+
+@lru_cache(maxsize=256)
+def parse_metrics(spec: str) -> tuple[tuple[str, str | None], ...]:
+    """'count,avg:height' -> (('count', None), ('avg', 'height'))."""
+    metrics = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        m = _METRIC_RE.match(part)
+        if not m:
+            raise _invalid(f"cannot parse metric '{part.strip()}'")
+        func, field = m.groups()
+        if func != "count" and field is None:
+            raise _invalid(f"'{func}' needs a numeric field (ex: {func}:height)")
+        metrics.append((func, field))
+    if not metrics:
+        raise _invalid("no metrics")
+    return tuple(dict.fromkeys(metrics))
+
+
+def metric_name(func: str, field: str | None) -> str:
+    return func if field is None else f"{func}_{field}"
+
+
+def _groups(
+    items: list[dict[str, Any]], columns: ColumnStore, rows: np.ndarray, group_by: str
+) -> tuple[np.ndarray, np.ndarray, list[Any]]:
+    """
+    (linha de cada ocorrência, código do grupo de cada ocorrência, rótulo de cada grupo).
+    Campo escalar: uma ocorrência por item. Campo lista (films, species...): uma por elemento,
+    e lista vazia cai no grupo None.
+    """
+    if group_by in columns.text:
+        occurrences = rows
+        keys = columns.text[group_by][rows]
+    else:
+        occ, labels = [], []
+        for i in rows.tolist():
+            values = items[i].get(group_by)
+            for v in values or [None]:
+                occ.append(i)
+                labels.append(normalize_text(v))
+        occurrences = np.array(occ, dtype=np.int64)
+        keys = np.array(labels, dtype=str)
+
+    if not len(occurrences):
+        return occurrences, occurrences, []
+    # agrupa sem diferenciar maiúsculas; o rótulo é o valor original da primeira ocorrência
+    _, first, codes = np.unique(keys, return_index=True, return_inverse=True)
+    if group_by in columns.text:
+        labels = [items[occurrences[f]].get(group_by) for f in first]
+    else:
+        labels = [None if keys[f] == "" else _original(items[occurrences[f]].get(group_by), keys[f]) for f in first]
+    return occurrences, codes.reshape(-1), labels
+
+
+def _original(values: list[Any], key: str) -> Any:
+    return next(v for v in values if normalize_text(v) == key)
+
+
+def compute(
+    items: list[dict[str, Any]],
+    columns: ColumnStore,
+    mask: np.ndarray,
+    group_by: str | None,
+    metrics: tuple[tuple[str, str | None], ...],
+) -> list[dict[str, Any]]:
+    """
+    Um dict por grupo ({"key": rótulo, "count": n, "avg_height": ...}), do maior grupo para o menor.
+    Tudo sai das colunas tipadas com bincount/ufunc.at: nenhum valor é convertido de string aqui.
+    """
+    for func, field in metrics:
+        if field is not None and field not in columns.numeric_fields:
+            raise _invalid(f"'{field}' is not a numeric field")
+    if group_by is not None and group_by not in columns.text and not any(
+        isinstance(it.get(group_by), list) for it in items
+    ):
+        raise _invalid(f"unknown group_by field '{group_by}'")
+
+    rows = np.flatnonzero(mask)
+    if group_by is None:
+        occurrences, codes, labels = rows, np.zeros(len(rows), dtype=np.int64), [None]
+    else:
+        occurrences, codes, labels = _groups(items, columns, rows, group_by)
+    size = len(labels)
+
+    results: dict[str, np.ndarray] = {"count": np.bincount(codes, minlength=size)}
+    for func, field in metrics:
+        if field is None:
+            continue
+        column = columns.numeric[field]
+        valid = column.valid[occurrences]
+        g = codes[valid]
+        values = column.values[occurrences][valid]
+        n = np.bincount(g, minlength=size)
+        if func == "count":
+            out = n
+        elif func in ("sum", "avg"):
+            total = np.bincount(g, weights=values, minlength=size)
+            out = total if func == "sum" else np.divide(total, n, out=np.full(size, np.nan), where=n > 0)
+        else:
+            ufunc, start = (np.minimum, np.inf) if func == "min" else (np.maximum, -np.inf)
+            out = np.full(size, start)
+            ufunc.at(out, g, values)
+            out[n == 0] = np.nan
+        results[metric_name(func, field)] = out
+
+    names = ["count"] + [metric_name(f, c) for f, c in metrics if metric_name(f, c) != "count"]
+    groups = [
+        {"key": labels[i], **{name: json_number(results[name][i].item()) for name in names}}
+        for i in range(size)
+    ]
+    groups.sort(key=lambda g: (-g["count"], normalize_text(g["key"])))
+    return groups
+
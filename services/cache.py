@@ -0,0 +1,407 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any
+
+from fastapi import HTTPException
+
+from services import cache_backends, mirror, swapi_client
+from services.cache_backends import CacheBackend
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_SWEEP_SECONDS = int(os.getenv("CACHE_SWEEP_SECONDS", "30"))
+
+# Depois do TTL (soft) a entrada ainda é servida, como "stale", por mais CACHE_STALE_SECONDS (hard)
+# enquanto uma atualização roda em background (stale-while-revalidate).
+CACHE_STALE_SECONDS = int(os.getenv("CACHE_STALE_SECONDS", "300"))
+# Chaves populares (>= CACHE_REFRESH_AHEAD_HITS leituras) são atualizadas antes de vencer,
+# quando faltam CACHE_REFRESH_AHEAD_SECONDS para o TTL (refresh-ahead).
+CACHE_REFRESH_AHEAD_SECONDS = int(os.getenv("CACHE_REFRESH_AHEAD_SECONDS", "10"))
+CACHE_REFRESH_AHEAD_HITS = int(os.getenv("CACHE_REFRESH_AHEAD_HITS", "5"))
+# Último valor bom guardado por até CACHE_STALE_IF_ERROR_SECONDS depois do TTL:
+# só é usado quando o upstream falha (5xx, rede, circuito aberto) — stale-if-error.
+CACHE_STALE_IF_ERROR_SECONDS = int(os.getenv("CACHE_STALE_IF_ERROR_SECONDS", "86400"))
+# 404 do upstream também é guardado (cache negativo), por pouco tempo: IDs inválidos repetidos
+# não voltam à SWAPI a cada requisição
+CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("CACHE_NEGATIVE_TTL_SECONDS", "30"))
+
+
+def _sizeof(value: Any) -> int:
+    # tamanho aproximado do valor serializado; basta para o orçamento de memória
+    return len(json.dumps(value, separators=(",", ":"), default=str))
+
+
+class Entry:
+    """
+    Até soft_expires_at: fresco. Até stale_expires_at: servido stale, revalidando em background.
+    Até expires_at: guardado só como último valor bom, para quando o upstream falhar.
+    """
+
+    __slots__ = ("value", "soft_expires_at", "stale_expires_at", "expires_at", "size", "hits")
+
+    def __init__(self, value: Any, soft_expires_at: float, stale_expires_at: float, expires_at: float, size: int):
+        self.value = value
+        self.soft_expires_at = soft_expires_at
+        self.stale_expires_at = stale_expires_at
+        self.expires_at = expires_at
+        self.size = size
+        self.hits = 0
+
+
+class TTLCache:
+    """
+    Cache LRU com TTL por entrada e dois limites: quantidade de entradas e bytes.
+    Ao passar de qualquer limite, remove as entradas usadas há mais tempo.
+    Cada entrada tem um TTL soft (depois dele é "stale") e um hard (depois dele some).
+    Entradas vencidas são varridas periodicamente (a cada `sweep_interval` s, na escrita),
+    e não só quando a mesma URL é pedida de novo.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        sweep_interval: int = CACHE_SWEEP_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._data: OrderedDict[str, Entry] = OrderedDict()
+        self._bytes = 0
+        self._last_sweep = time.time()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def get_entry(self, key: str) -> Entry | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if time.time() >= entry.expires_at:
+                self._remove(key)
+                return None
+            entry.hits += 1
+            self._data.move_to_end(key)
+            return entry
+
+    def get(self, key: str) -> Any | None:
+        entry = self.get_entry(key)
+        return entry.value if entry is not None else None
+
+    def put(
+        self,
+        key: str,
+        value: Any,
+        ttl: float = CACHE_TTL_SECONDS,
+        stale_ttl: float = 0,
+        stale_if_error_ttl: float = 0,
+    ) -> None:
+        size = _sizeof(value)
+        now = time.time()
+        soft = now + ttl
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._data[key] = Entry(value, soft, soft + stale_ttl, soft + max(stale_ttl, stale_if_error_ttl), size)
+            self._bytes += size
+
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+
+    def entries(self) -> list[tuple[str, float, float, Any]]:
+        """(chave, soft, hard, valor) das entradas ainda válidas, da menos para a mais recente."""
+        now = time.time()
+        with self._lock:
+            return [(k, e.soft_expires_at, e.expires_at, e.value) for k, e in self._data.items() if now < e.expires_at]
+
+    def sweep(self) -> int:
+        with self._lock:
+            return self._sweep(time.time())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self._last_sweep = time.time()
+
+    def _sweep(self, now: float) -> int:
+        expired = [k for k, e in self._data.items() if now >= e.expires_at]
+        for k in expired:
+            self._remove(k)
+        self._last_sweep = now
+        return len(expired)
+
+    def _remove(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+
+# Cache único do processo, compartilhado por todos os routers (chave = URL do upstream)
+_CACHE = TTLCache()
+
+# URLs que o upstream respondeu com 404; só no L1 (valor é sempre True)
+_NEGATIVE = TTLCache()
+
+# L2 opcional, compartilhado entre processos (ver services/cache_backends.py).
+# Falhas do L2 nunca derrubam a requisição: o L1 e o upstream continuam atendendo.
+CACHE_L2_URL = os.getenv("CACHE_L2_URL")
+_L2: CacheBackend | None = cache_backends.from_url(CACHE_L2_URL)
+
+# Por requisição: URLs servidas com valor stale (ver begin_request e o middleware em main.py)
+_stale_urls: ContextVar[list[str] | None] = ContextVar("stale_urls", default=None)
+
+# Atualizações em background (stale-while-revalidate / refresh-ahead) em andamento
+_refreshing: set[str] = set()
+_refreshing_lock = threading.Lock()
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+_refresh_tasks: set[asyncio.Task] = set()
+
+
+def _l2_get(url: str) -> Entry | None:
+    if _L2 is None:
+        return None
+    try:
+        hit = _L2.get(url)
+    except Exception:
+        logger.exception("L2 cache get failed")
+        return None
+    if hit is None:
+        return None
+    expires_at, value = hit
+    # promove para o L1 com o que ainda resta (o L2 guarda só o hard; o soft é derivado dele)
+    restore(url, value, expires_at - _retention(), expires_at)
+    return _CACHE.get_entry(url)
+
+
+def _l2_put(entries: list[tuple[str, Any]], ttl: float) -> None:
+    if _L2 is None or not entries:
+        return
+    try:
+        _L2.set_many(entries, time.time() + ttl + _retention())
+    except Exception:
+        logger.exception("L2 cache set failed")
+
+
+def _retention() -> float:
+    return max(CACHE_STALE_SECONDS, CACHE_STALE_IF_ERROR_SECONDS)
+
+
+def get_entry(url: str) -> Entry | None:
+    entry = _CACHE.get_entry(url)
+    return entry if entry is not None else _l2_get(url)
+
+
+async def aget_entry(url: str) -> Entry | None:
+    entry = _CACHE.get_entry(url)
+    if entry is not None or _L2 is None:
+        return entry
+    return await asyncio.to_thread(_l2_get, url)
+
+
+def get(url: str) -> Any | None:
+    """Valor fresco ou stale (até o fim da janela de stale-while-revalidate)."""
+    entry = get_entry(url)
+    return entry.value if entry is not None and time.time() < entry.stale_expires_at else None
+
+
+def put(url: str, value: Any, ttl: float = CACHE_TTL_SECONDS) -> None:
+    _CACHE.put(url, value, ttl, CACHE_STALE_SECONDS, CACHE_STALE_IF_ERROR_SECONDS)
+    _l2_put([(url, value)], ttl)
+
+
+async def aput_many(entries: list[tuple[str, Any]], ttl: float = CACHE_TTL_SECONDS) -> None:
+    for url, value in entries:
+        _CACHE.put(url, value, ttl, CACHE_STALE_SECONDS, CACHE_STALE_IF_ERROR_SECONDS)
+    if _L2 is not None:
+        await asyncio.to_thread(_l2_put, entries, ttl)
+
+
+def clear() -> None:
+    _CACHE.clear()
+    _NEGATIVE.clear()
+    with _refreshing_lock:
+        _refreshing.clear()
+    if _L2 is not None:
+        _L2.clear()
+
+
+def entries() -> list[tuple[str, float, float, Any]]:
+    return _CACHE.entries()
+
+
+def restore(url: str, value: Any, soft_expires_at: float, expires_at: float) -> None:
+    """Reinsere uma entrada com seus instantes de expiração originais (ex: vinda de um snapshot)."""
+    ttl = soft_expires_at - time.time()
+    _CACHE.put(url, value, ttl, min(CACHE_STALE_SECONDS, expires_at - soft_expires_at), expires_at - soft_expires_at)
+
+
+def begin_request() -> list[str]:
+    """Começa a registrar as URLs servidas stale nesta requisição; devolve a lista (preenchida depois)."""
+    stale: list[str] = []
+    _stale_urls.set(stale)
+    return stale
+
+
+def _mark_stale(url: str) -> None:
+    stale = _stale_urls.get()
+    if stale is not None:
+        stale.append(url)
+
+
+def _serve(url: str, entry: Entry) -> Any:
+    if time.time() >= entry.soft_expires_at:
+        _mark_stale(url)
+    return entry.value
+
+
+def _usable(entry: Entry | None) -> bool:
+    return entry is not None and time.time() < entry.stale_expires_at
+
+
+def _check_negative(url: str) -> None:
+    if _NEGATIVE.get(url):
+        raise HTTPException(status_code=404, detail="Resource not found")
+
+
+def _on_upstream_error(url: str, entry: Entry | None, exc: HTTPException) -> Any:
+    if exc.status_code == 404:
+        _NEGATIVE.put(url, True, CACHE_NEGATIVE_TTL_SECONDS)
+    # upstream fora (5xx, rede ou circuito aberto): devolve o último valor bom, se houver
+    if entry is None or exc.status_code < 500:
+        raise exc
+    logger.warning("Serving stale %s: upstream failed with %s", url, exc.status_code)
+    _mark_stale(url)
+    return entry.value
+
+
+def _needs_refresh(entry: Entry) -> bool:
+    remaining = entry.soft_expires_at - time.time()
+    if remaining <= 0:
+        return True
+    return entry.hits >= CACHE_REFRESH_AHEAD_HITS and remaining <= CACHE_REFRESH_AHEAD_SECONDS
+
+
+def _claim_refresh(url: str) -> bool:
+    with _refreshing_lock:
+        if url in _refreshing:
+            return False
+        _refreshing.add(url)
+        return True
+
+
+def _refresh(url: str, ttl: float) -> None:
+    try:
+        put(url, swapi_client.get_json(url), ttl)
+    except Exception:
+        # mantém o valor stale; a próxima leitura tenta de novo
+        logger.warning("Background refresh failed for %s", url, exc_info=True)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(url)
+
+
+async def _arefresh(url: str, ttl: float, page: bool) -> None:
+    try:
+        data = await swapi_client.aget_json(url)
+        await aput_many([(url, data)] + (_page_results(data) if page else []), ttl)
+    except Exception:
+        logger.warning("Background refresh failed for %s", url, exc_info=True)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(url)
+
+
+def _schedule_arefresh(url: str, ttl: float, page: bool = False) -> None:
+    if not _claim_refresh(url):
+        return
+    task = asyncio.create_task(_arefresh(url, ttl, page))
+    # guarda a referência para a task não ser coletada antes de terminar
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+def get_json_cached(url: str, ttl: float = CACHE_TTL_SECONDS) -> Any:
+    # com o espelho carregado, ele tem prioridade: nenhuma ida ao upstream
+    value = mirror.lookup(url)
+    if value is not None:
+        return value
+
+    entry = get_entry(url)
+    if _usable(entry):
+        if _needs_refresh(entry) and _claim_refresh(url):
+            _refresh_pool.submit(_refresh, url, ttl)
+        return _serve(url, entry)
+
+    _check_negative(url)
+    try:
+        data = swapi_client.get_json(url)
+    except HTTPException as exc:
+        return _on_upstream_error(url, entry, exc)
+    put(url, data, ttl)
+    return data
+
+
+async def aget_json_cached(url: str, ttl: float = CACHE_TTL_SECONDS) -> Any:
+    value = mirror.lookup(url)
+    if value is not None:
+        return value
+
+    entry = await aget_entry(url)
+    if _usable(entry):
+        if _needs_refresh(entry):
+            _schedule_arefresh(url, ttl)
+        return _serve(url, entry)
+
+    _check_negative(url)
+    try:
+        data = await swapi_client.aget_json(url)
+    except HTTPException as exc:
+        return _on_upstream_error(url, entry, exc)
+    await aput_many([(url, data)], ttl)
+    return data
+
+
+def _page_results(page: Any) -> list[tuple[str, Any]]:
+    # cada item de uma página de listagem já é o registro completo: guarda também pela sua `url`
+    results = page.get("results") if isinstance(page, dict) else None
+    if not isinstance(results, list):
+        return []
+    return [(it["url"], it) for it in results if isinstance(it, dict) and isinstance(it.get("url"), str)]
+
+
+async def aget_page_cached(url: str, ttl: float = CACHE_TTL_SECONDS) -> Any:
+    """Como aget_json_cached, mas para páginas de listagem: popula o cache de detalhe de cada item."""
+    entry = await aget_entry(url)
+    if _usable(entry):
+        if _needs_refresh(entry):
+            _schedule_arefresh(url, ttl, page=True)
+        return _serve(url, entry)
+
+    _check_negative(url)
+    try:
+        data = await swapi_client.aget_json(url)
+    except HTTPException as exc:
+        return _on_upstream_error(url, entry, exc)
+    await aput_many([(url, data)] + _page_results(data), ttl)
+    return data
@@ -0,0 +1,115 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Protocol
+from urllib.parse import urlparse
+
+
+class CacheBackend(Protocol):
+    """
+    Cache L2, compartilhado entre processos (workers do uvicorn / réplicas no mesmo nó).
+    Guarda (expira_em, valor); o L1 em memória de cada processo fica na frente dele.
+    """
+
+    def get(self, key: str) -> tuple[float, Any] | None: ...
+
+    def set_many(self, entries: list[tuple[str, Any]], expires_at: float) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class SQLiteBackend:
+    """Arquivo SQLite local (WAL), visível para todos os processos do nó."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 não compartilha conexão entre threads: uma por thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> tuple[float, Any] | None:
+        row = self._conn().execute(
+            "SELECT expires_at, value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def set_many(self, entries: list[tuple[str, Any]], expires_at: float) -> None:
+        conn = self._conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)",
+            [(k, expires_at, json.dumps(v)) for k, v in entries],
+        )
+        # aproveita a escrita para limpar o que já venceu
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        conn.commit()
+
+    def clear(self) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM cache")
+        conn.commit()
+
+
+class RedisBackend:
+    """
+    Servidor que fala o protocolo Redis (Redis, KeyDB, Valkey...).
+    `client` é qualquer objeto com a API do redis-py usada aqui (get, set(px=), scan_iter, delete),
+    o que permite trocar por um substituto local nos testes.
+    """
+
+    def __init__(self, client: Any, prefix: str = "swapi:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("CACHE_L2_URL=redis://... requires the 'redis' package") from exc
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key: str) -> tuple[float, Any] | None:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        expires_at, value = json.loads(raw)
+        return expires_at, value
+
+    def set_many(self, entries: list[tuple[str, Any]], expires_at: float) -> None:
+        ttl_ms = int((expires_at - time.time()) * 1000)
+        if ttl_ms <= 0:
+            return
+        for k, v in entries:
+            self.client.set(self.prefix + k, json.dumps([expires_at, v]), px=ttl_ms)
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def from_url(url: str | None) -> CacheBackend | None:
+    """sqlite:///caminho/arquivo.db | redis://host:6379/0 | vazio = sem L2."""
+    if not url:
+        return None
+    scheme = urlparse(url).scheme
+    if scheme == "sqlite":
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if scheme in ("redis", "rediss", "unix"):
+        return RedisBackend.from_url(url)
+    raise ValueError(f"Unsupported CACHE_L2_URL scheme: {scheme!r}")
@@ -0,0 +1,140 @@
+from typing import Any
+
+import numpy as np
+
+# Valores que a SWAPI usa para "sem dado" em campos numéricos
+_NULLS = {"", "unknown", "n/a", "none", "indefinite"}
+
+
+def parse_number(value: Any) -> float | None:
+    """'1,000' -> 1000.0; 'unknown'/'n/a'/None/texto -> None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    text = value.strip().lower().replace(",", "")
+    if text in _NULLS:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def normalize_text(value: Any) -> str:
+    return str(value or "").strip().lower()
+
+
+def numeric_first(value: Any) -> tuple:
+    """
+    Chave de ordenação "números primeiro (pelo valor), depois texto (alfabético)".
+    Como chave Python serve para listas soltas; dentro de uma Collection a mesma ordem
+    é calculada de forma vetorizada a partir das colunas (ColumnStore.numeric_first_rank).
+    """
+    num = parse_number(value)
+    if num is not None:
+        return (0, num, "")
+    return (1, 0.0, normalize_text(value))
+
+
+def json_number(value: float | int) -> float | int | None:
+    """Valor de coluna para a resposta: NaN vira null, 1200.0 vira 1200, o resto arredonda em 4 casas."""
+    if isinstance(value, float):
+        if value != value:
+            return None
+        if value.is_integer():
+            return int(value)
+        return round(value, 4)
+    return value
+
+
+class NumericColumn:
+    """Valores float64 + máscara de presença (valid=False: nulo, ausente ou não numérico)."""
+
+    __slots__ = ("values", "valid")
+
+    def __init__(self, raw: list[Any]):
+        parsed = [parse_number(v) for v in raw]
+        self.valid = np.array([p is not None for p in parsed], dtype=bool)
+        self.values = np.array([p if p is not None else np.nan for p in parsed], dtype=np.float64)
+
+    @classmethod
+    def from_arrays(cls, values: np.ndarray, valid: np.ndarray) -> "NumericColumn":
+        column = cls.__new__(cls)
+        column.valid = valid
+        column.values = np.where(valid, values, np.nan)
+        return column
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class ColumnStore:
+    """
+    Colunas tipadas de uma coleção, montadas uma vez na ingestão: para cada campo escalar,
+    uma coluna numérica (com máscara de nulos) e uma coluna de texto normalizado.
+    Nada é convertido de string na hora da requisição.
+    """
+
+    def __init__(self, items: list[dict[str, Any]]):
+        self.size = len(items)
+        fields: dict[str, None] = {}
+        for it in items:
+            for field, value in it.items():
+                if value is None or isinstance(value, (str, int, float)):
+                    fields[field] = None
+
+        self.numeric: dict[str, NumericColumn] = {}
+        self.text: dict[str, np.ndarray] = {}
+        for field in fields:
+            raw = [it.get(field) for it in items]
+            self.numeric[field] = NumericColumn(raw)
+            self.text[field] = np.array([normalize_text(v) for v in raw], dtype=str)
+        # campos de fato numéricos (algum valor é número) + derivados: os aceitos em métricas
+        self.numeric_fields = {field for field, column in self.numeric.items() if column.valid.any()}
+
+    def add_derived(self, field: str, column: NumericColumn) -> None:
+        """Coluna calculada a partir de outras (ex: bmi); fica disponível como qualquer campo numérico."""
+        self.numeric[field] = column
+        self.numeric_fields.add(field)
+
+    def numeric_column(self, field: str) -> NumericColumn:
+        column = self.numeric.get(field)
+        return column if column is not None else NumericColumn([None] * self.size)
+
+    def text_column(self, field: str) -> np.ndarray:
+        column = self.text.get(field)
+        return column if column is not None else np.full(self.size, "", dtype=str)
+
+    def numeric_first_rank(self, field: str) -> np.ndarray:
+        """Posto denso de cada item pela chave numeric_first (itens com a mesma chave, mesmo posto)."""
+        column = self.numeric_column(field)
+        primary = (~column.valid).astype(np.int8)
+        secondary = np.where(column.valid, column.values, 0.0)
+        _, tertiary = np.unique(np.where(column.valid, "", self.text_column(field)), return_inverse=True)
+        return dense_rank((tertiary, secondary, primary))
+
+
+def ratio(numerator: NumericColumn, denominator: NumericColumn) -> NumericColumn:
+    """numerator / denominator item a item; nulo onde falta um dos dois ou o divisor não é positivo."""
+    valid = numerator.valid & denominator.valid & (np.nan_to_num(denominator.values) > 0)
+    values = np.divide(numerator.values, denominator.values, out=np.full(len(valid), np.nan), where=valid)
+    return NumericColumn.from_arrays(values, valid)
+
+
+def dense_rank(keys: tuple[np.ndarray, ...]) -> np.ndarray:
+    """Posto denso pela ordenação lexicográfica de `keys` (a última é a principal, como em np.lexsort)."""
+    size = len(keys[0])
+    if not size:
+        return np.zeros(0, dtype=np.int64)
+    order = np.lexsort(keys)
+    changed = np.zeros(size, dtype=bool)
+    changed[0] = True
+    for k in keys:
+        s = k[order]
+        changed[1:] |= s[1:] != s[:-1]
+    rank = np.empty(size, dtype=np.int64)
+    rank[order] = np.cumsum(changed) - 1
+    return rank
@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from typing import Any
+
+from fastapi import HTTPException
+
+from services import cache, known_ids, mirror, swapi_client
+from services.mirror import Collection
+from services.swapi_client import SWAPI_BASE_URL
+
+# Coleções inteiras, já ingeridas (com índices), para busca/ordenação locais.
+# No modo espelho é o próprio espelho; fora dele, são montadas a partir das páginas da
+# listagem (em cache) e só reindexadas quando essas páginas mudam.
+_LOCAL: dict[str, Collection] = {}
+
+# Versões anteriores de cada coleção, para cursores de paginação emitidos antes de uma atualização
+# continuarem lendo o mesmo snapshot
+RETAINED_VERSIONS = 3
+_RETAINED: dict[str, OrderedDict[int, Collection]] = {}
+
+
+async def aget(resource: str, version: int | None = None) -> Collection:
+    """
+    Coleção atual do recurso. Com `version` (vinda de um cursor), a daquela versão, se ainda estiver
+    guardada; senão 410 e o cliente recomeça da primeira página.
+    """
+    if version is not None:
+        retained = _RETAINED.get(resource, {}).get(version)
+        if retained is not None:
+            return retained
+
+    collection = await _aget_current(resource)
+    _retain(collection)
+    if version is not None and collection.version != version:
+        raise HTTPException(status_code=410, detail="Cursor expired: the dataset changed, restart from the first page")
+    return collection
+
+
+def _retain(collection: Collection) -> None:
+    versions = _RETAINED.setdefault(collection.resource, OrderedDict())
+    versions[collection.version] = collection
+    versions.move_to_end(collection.version)
+    while len(versions) > RETAINED_VERSIONS:
+        versions.popitem(last=False)
+
+
+async def _aget_current(resource: str) -> Collection:
+    collection = mirror.get(resource)
+    if collection is not None:
+        return collection
+
+    # listagem completa e sem `search`: a busca é resolvida no índice, não no upstream
+    items, total = await swapi_client.acollect(
+        f"{SWAPI_BASE_URL}/{resource}/", cache.aget_page_cached, max_pages=None
+    )
+    known_ids.record_crawl(resource, items, total)
+
+    local = _LOCAL.get(resource)
+    if local is None or not _same_items(local.items, items):
+        local = _LOCAL[resource] = Collection(resource, items, mirror.next_version())
+    return local
+
+
+def _same_items(current: list[dict[str, Any]], items: list[dict[str, Any]]) -> bool:
+    """
+    Mesmo conteúdo, não os mesmos objetos: uma revalidação do cache troca os objetos das páginas
+    mesmo quando o upstream devolve os mesmos dados, e isso não pode gerar uma versão nova
+    (cursores expirariam e os índices seriam remontados à toa).
+    """
+    return len(current) == len(items) and all(_same_item(a, b) for a, b in zip(current, items))
+
+
+def _same_item(a: dict[str, Any], b: dict[str, Any]) -> bool:
+    if a is b:
+        return True
+    # a SWAPI atualiza `edited` a cada alteração do registro; sem ele, compara o conteúdo inteiro
+    if a.get("url") and a.get("edited") and b.get("edited"):
+        return a.get("url") == b.get("url") and a["edited"] == b["edited"]
+    return a == b
+
+
+def clear() -> None:
+    _LOCAL.clear()
+    _RETAINED.clear()
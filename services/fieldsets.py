@@ -0,0 +1,77 @@
+from functools import lru_cache
+from typing import Any
+
+# Projeção `fields=` (sparse fieldsets): CSV de campos, com "." para entrar numa relação expandida.
+#   fields=name,url                 só esses campos de cada item
+#   fields=name,homeworld.name      homeworld (se expandido) só com name
+# Relação fora de `fields` nem é resolvida, mesmo que esteja em `expand`.
+
+
+class FieldSet:
+    """children: campo -> FieldSet dos subcampos, ou None para o campo inteiro."""
+
+    __slots__ = ("children",)
+
+    def __init__(self) -> None:
+        self.children: dict[str, FieldSet | None] = {}
+
+    def add(self, path: list[str]) -> None:
+        name, rest = path[0], path[1:]
+        if name in self.children and self.children[name] is None:
+            return
+        if not rest:
+            self.children[name] = None
+            return
+        child = self.children.get(name) or FieldSet()
+        child.add(rest)
+        self.children[name] = child
+
+    def apply(self, value: Any) -> Any:
+        # só os campos pedidos são lidos e copiados; URL de relação não expandida passa como está
+        if isinstance(value, list):
+            return [self.apply(v) for v in value]
+        if not isinstance(value, dict):
+            return value
+        return {
+            name: value[name] if sub is None else sub.apply(value[name])
+            for name, sub in self.children.items()
+            if name in value
+        }
+
+
+@lru_cache(maxsize=256)
+def parse(spec: str | None) -> FieldSet | None:
+    """'name,homeworld.name' -> FieldSet; vazio/None = sem projeção (resposta completa)."""
+    if not spec:
+        return None
+    fieldset = FieldSet()
+    for part in spec.split(","):
+        path = [p.strip() for p in part.split(".")]
+        if all(path):
+            fieldset.add(path)
+    return fieldset if fieldset.children else None
+
+
+def restrict(expand: set[str], fieldset: FieldSet | None) -> set[str]:
+    """Relações de `expand` que aparecem em `fields`: as outras não são buscadas."""
+    if fieldset is None:
+        return expand
+    return {e for e in expand if e in fieldset.children}
+
+
+def wants(fieldset: FieldSet | None, path: str) -> bool:
+    """'species.homeworld' está em `fields` (direto ou pelo campo pai inteiro)? Sem fieldset, tudo está."""
+    for name in path.split("."):
+        if fieldset is None:
+            return True
+        if name not in fieldset.children:
+            return False
+        fieldset = fieldset.children[name]
+    return True
+
+
+def project(value: Any, fieldset: FieldSet | None) -> Any:
+    """Um item (ou lista de itens) só com os campos pedidos; sem fieldset, o próprio valor."""
+    if fieldset is None:
+        return value
+    return fieldset.apply(value)
@@ -0,0 +1,104 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+from fastapi import HTTPException
+
+from services.columns import ColumnStore, normalize_text, parse_number
+
+# Expressão de filtro: cláusulas separadas por ";" (todas precisam valer):
+#   population>1e9        comparação numérica (> >= < <=)
+#   climate~arid          contém (texto, sem diferenciar maiúsculas); climate~arid|frozen, algum deles
+#   gender=female         igual (número ou texto);  != diferente
+#   diameter=1000..20000  intervalo fechado
+#   terrain=desert|tundra um dos valores (in)
+_CLAUSE_RE = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*(>=|<=|!=|==|=|>|<|~)\s*(.*?)\s*$")
+
+
+class Clause:
+    """Uma cláusula já interpretada; mask() devolve a máscara booleana sobre as colunas da coleção."""
+
+    def __init__(self, field: str, op: str, raw: str):
+        self.field = field
+        self.op = "=" if op == "==" else op
+        self.negate = self.op == "!="
+        self.range: tuple[float, float] | None = None
+        self.numbers: list[float] | None = None
+        self.texts = [normalize_text(v) for v in raw.split("|")]
+
+        if self.op in ("=", "!=") and ".." in raw:
+            lo, _, hi = raw.partition("..")
+            bounds = parse_number(lo), parse_number(hi)
+            if None in bounds:
+                raise _invalid(f"range bounds must be numbers in '{field}{op}{raw}'")
+            self.range = bounds
+        elif self.op != "~":
+            numbers = [parse_number(v) for v in raw.split("|")]
+            if all(n is not None for n in numbers):
+                self.numbers = numbers
+            elif self.op in (">", ">=", "<", "<="):
+                raise _invalid(f"'{field}{op}{raw}' needs a number")
+
+    def mask(self, columns: ColumnStore) -> np.ndarray:
+        if self.field not in columns.numeric:
+            raise _invalid(f"unknown field '{self.field}'")
+
+        if self.op == "~":
+            # climate~arid|temperate: contém algum dos valores
+            text = columns.text_column(self.field)
+            matched = np.zeros(columns.size, dtype=bool)
+            for value in self.texts:
+                matched |= np.char.find(text, value) >= 0
+            return matched
+
+        column = columns.numeric_column(self.field)
+        if self.range is not None:
+            lo, hi = self.range
+            matched = column.valid & (column.values >= lo) & (column.values <= hi)
+        elif self.numbers is not None:
+            value = self.numbers[0]
+            if self.op == ">":
+                return column.valid & (column.values > value)
+            if self.op == ">=":
+                return column.valid & (column.values >= value)
+            if self.op == "<":
+                return column.valid & (column.values < value)
+            if self.op == "<=":
+                return column.valid & (column.values <= value)
+            matched = column.valid & np.isin(column.values, self.numbers)
+        else:
+            matched = np.isin(columns.text_column(self.field), self.texts)
+        return ~matched if self.negate else matched
+
+
+class FilterExpr:
+    def __init__(self, clauses: list[Clause]):
+        self.clauses = clauses
+
+    def mask(self, columns: ColumnStore) -> np.ndarray:
+        mask = np.ones(columns.size, dtype=bool)
+        if not columns.size:
+            return mask
+        for clause in self.clauses:
+            mask &= clause.mask(columns)
+        return mask
+
+
+def _invalid(reason: str) -> HTTPException:
+    return HTTPException(status_code=400, detail=f"Invalid filter: {reason}")
+
+
+@lru_cache(maxsize=256)
+def compile_filter(expr: str) -> FilterExpr:
+    """Interpreta a expressão uma vez (e guarda): a avaliação depois é só aritmética de máscaras."""
+    clauses = []
+    for part in expr.split(";"):
+        if not part.strip():
+            continue
+        m = _CLAUSE_RE.match(part)
+        if not m:
+            raise _invalid(f"cannot parse '{part.strip()}'")
+        clauses.append(Clause(*m.groups()))
+    if not clauses:
+        raise _invalid("empty expression")
+    return FilterExpr(clauses)
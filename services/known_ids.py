@@ -0,0 +1,37 @@
+from typing import Any
+
+from fastapi import HTTPException
+
+# IDs válidos de cada recurso, montados a partir de crawls completos da coleção
+# (espelho ou listagem inteira sem busca). Com o conjunto conhecido, um ID fora dele
+# é 404 direto na rota, sem cache e sem upstream.
+_IDS: dict[str, frozenset[int]] = {}
+
+
+def id_from_url(url: Any) -> int | None:
+    """https://swapi.dev/api/planets/12/ -> 12"""
+    if not isinstance(url, str):
+        return None
+    tail = url.rstrip("/").rsplit("/", 1)[-1]
+    return int(tail) if tail.isdigit() else None
+
+
+def record(resource: str, items: list[dict[str, Any]]) -> None:
+    ids = (id_from_url(it.get("url")) for it in items if isinstance(it, dict))
+    _IDS[resource] = frozenset(i for i in ids if i is not None)
+
+
+def record_crawl(resource: str, items: list[dict[str, Any]], total: int | None) -> None:
+    # só uma coleção completa diz quais IDs existem; um pedaço dela não
+    if items and isinstance(total, int) and len(items) >= total:
+        record(resource, items)
+
+
+def ensure_known(resource: str, item_id: int) -> None:
+    ids = _IDS.get(resource)
+    if ids is not None and item_id not in ids:
+        raise HTTPException(status_code=404, detail="Resource not found")
+
+
+def clear() -> None:
+    _IDS.clear()
@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from collections.abc import Sequence
+from typing import Any, Callable
+
+import numpy as np
+
+from services import aggregate, known_ids, swapi_client, topk
+from services.columns import ColumnStore, NumericColumn, json_number, numeric_first
+from services.filters import FilterExpr, compile_filter
+from services.search_index import NgramIndex, PrefixIndex
+from services.swapi_client import SWAPI_BASE_URL
+
+logger = logging.getLogger(__name__)
+
+RESOURCES = ("people", "films", "planets", "species", "starships", "vehicles")
+
+# Modo espelho: baixa as seis coleções da SWAPI no startup (e periodicamente)
+# e todas as rotas respondem a partir da memória, sem upstream no caminho da requisição.
+MIRROR_ENABLED = os.getenv("SWAPI_MIRROR", "0") == "1"
+MIRROR_REFRESH_SECONDS = int(os.getenv("SWAPI_MIRROR_REFRESH_SECONDS", "3600"))
+
+# Agregações guardadas por coleção (uma coleção nova, de outra versão, começa vazia)
+AGGREGATE_CACHE_SIZE = 128
+
+
+# Ordenações pré-calculadas na ingestão: recurso -> [(campo, chave)], registradas pelos routers
+_SORT_KEYS: dict[str, list[tuple[str, Callable[[Any], Any]]]] = defaultdict(list)
+
+
+def register_sort_keys(resource: str, fields: set[str], key: Callable[[Any], Any]) -> None:
+    """`key(valor do campo)` é a chave de ordenação usada pelo router para esses campos."""
+    _SORT_KEYS[resource].extend((field, key) for field in sorted(fields))
+
+
+# Colunas numéricas derivadas (ex: bmi), calculadas na ingestão: recurso -> [(campo, função)]
+_DERIVED: dict[str, list[tuple[str, Callable[[ColumnStore], NumericColumn]]]] = defaultdict(list)
+
+
+def register_derived(resource: str, field: str, compute: Callable[[ColumnStore], NumericColumn]) -> None:
+    """`compute(colunas da coleção)` devolve a coluna; ela serve para ranking, filtro e agregação."""
+    _DERIVED[resource].append((field, compute))
+
+
+class OrderedView(Sequence):
+    """Itens de uma coleção numa ordem pré-calculada, sem copiar: uma fatia custa O(tamanho da fatia)."""
+
+    def __init__(self, items: list[dict[str, Any]], order: Sequence[int]):
+        self._items = items
+        self._order = order
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._items[i] for i in self._order[index]]
+        return self._items[self._order[index]]
+
+
+class Collection:
+    """Snapshot imutável de um recurso inteiro da SWAPI, com os índices montados na ingestão."""
+
+    def __init__(self, resource: str, items: list[dict[str, Any]], version: int):
+        self.resource = resource
+        self.items = items
+        self.version = version
+        self.loaded_at = time.time()
+        self.by_url = {it["url"]: it for it in items if isinstance(it.get("url"), str)}
+        labels = [it.get("name") or it.get("title") for it in items]
+        self.name_index = NgramIndex(labels)
+        self.prefix_index = PrefixIndex(labels)
+        self.columns = ColumnStore(items)
+        for field, compute in _DERIVED.get(resource, ()):
+            self.columns.add_derived(field, compute(self.columns))
+        self._positions = {id(it): i for i, it in enumerate(items)}
+        self._ranks: dict[tuple[str, Callable[[Any], Any]], np.ndarray] = {}
+        self._orders: dict[tuple[str, Callable[[Any], Any], bool], list[int]] = {}
+        self._aggregates: dict[tuple, list[dict[str, Any]]] = {}
+        self._sort_fields = {field for field, _ in _SORT_KEYS.get(resource, ())}
+        for field, key in _SORT_KEYS.get(resource, ()):
+            self.ordered(field, key, reverse=False)
+            self.ordered(field, key, reverse=True)
+
+    def position(self, item: dict[str, Any]) -> int:
+        return self._positions[id(item)]
+
+    def _memoizable(self, field: str) -> bool:
+        # só campos que existem nos itens (ou registrados): `sort` livre (ex: /search) não faz o
+        # cache da coleção crescer sem limite; esses são calculados a cada requisição
+        return field in self.columns.text or field in self._sort_fields
+
+    def rank(self, field: str, key: Callable[[Any], Any]) -> np.ndarray:
+        """
+        Posto denso de cada item por key(item[field]): itens com a mesma chave têm o mesmo posto.
+        Com key=columns.numeric_first sai vetorizado das colunas tipadas, sem converter strings.
+        """
+        cache_key = (field, key)
+        rank = self._ranks.get(cache_key)
+        if rank is None:
+            if key is numeric_first:
+                rank = self.columns.numeric_first_rank(field)
+            else:
+                keys = [key(it.get(field)) for it in self.items]
+                ids = {k: i for i, k in enumerate(sorted(set(keys)))}
+                rank = np.array([ids[k] for k in keys], dtype=np.int64)
+            if self._memoizable(field):
+                self._ranks[cache_key] = rank
+        return rank
+
+    def ordered(self, field: str, key: Callable[[Any], Any], reverse: bool = False) -> OrderedView:
+        """
+        Itens ordenados por key(item[field]), igual a sorted(items, ..., reverse=reverse) (estável).
+        A permutação é calculada uma vez por coleção (na ingestão, para os campos registrados).
+        """
+        cache_key = (field, key, reverse)
+        order = self._orders.get(cache_key)
+        if order is None:
+            rank = self.rank(field, key)
+            # argsort estável: empates ficam na ordem original, como no sorted(reverse=True)
+            order = np.argsort(-rank if reverse else rank, kind="stable").tolist()
+            if self._memoizable(field):
+                self._orders[cache_key] = order
+        return OrderedView(self.items, order)
+
+    def sort_keys(
+        self, items: list[dict[str, Any]], field: str, key: Callable[[Any], Any], reverse: bool = False
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """(chave de ordenação, posição na coleção) de cada item; a chave é o posto, negado se reverse."""
+        rank = self.rank(field, key)
+        positions = np.fromiter((self.position(it) for it in items), dtype=np.int64, count=len(items))
+        return (-rank[positions] if reverse else rank[positions]), positions
+
+    def page_after(
+        self,
+        items: list[dict[str, Any]],
+        field: str,
+        key: Callable[[Any], Any],
+        reverse: bool,
+        after: tuple[int, int],
+        limit: int,
+    ) -> list[int]:
+        """
+        Índices (em items) dos `limit` itens seguintes de sorted(items, ...) depois de `after` =
+        (chave, índice) do último já entregue. Keyset: nada do que veio antes é reordenado.
+        """
+        keys, _ = self.sort_keys(items, field, key, reverse)
+        last_key, last_index = after
+        index = np.arange(len(items))
+        candidates = np.flatnonzero((keys > last_key) | ((keys == last_key) & (index > last_index)))
+        return topk.top_indices(keys, candidates, limit).tolist()
+
+    def where(self, expr: FilterExpr, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Os itens de `items` (a coleção ou um subconjunto dela) que satisfazem expr, na mesma ordem."""
+        mask = expr.mask(self.columns)
+        if items is self.items:
+            return [self.items[i] for i in np.flatnonzero(mask)]
+        return [it for it in items if mask[self.position(it)]]
+
+    def top(
+        self, field: str, n: int, reverse: bool = True, filter_: str | None = None
+    ) -> list[tuple[int, float | int]]:
+        """
+        (posição, valor) dos `n` itens com maior (reverse=False: menor) valor numérico em `field`.
+        Itens sem valor ficam de fora.
+        """
+        column = self.columns.numeric_column(field)
+        valid = column.valid
+        if filter_:
+            valid = valid & compile_filter(filter_).mask(self.columns)
+        positions = topk.top_indices(column.values, np.flatnonzero(valid), n, reverse)
+        return [(pos, json_number(column.values[pos].item())) for pos in positions.tolist()]
+
+    def aggregate(self, group_by: str | None, metrics: str, filter_: str | None = None) -> list[dict[str, Any]]:
+        """
+        Agrupa por `group_by` (ou tudo num grupo só) e calcula `metrics` (ver services.aggregate).
+        A coleção é imutável, então o resultado fica guardado nela: vale até a próxima versão do dataset.
+        """
+        parsed = aggregate.parse_metrics(metrics)
+        cache_key = (group_by, parsed, filter_)
+        groups = self._aggregates.get(cache_key)
+        if groups is None:
+            if filter_:
+                mask = compile_filter(filter_).mask(self.columns)
+            else:
+                mask = np.ones(len(self.items), dtype=bool)
+            groups = aggregate.compute(self.items, self.columns, mask, group_by, parsed)
+            if len(self._aggregates) >= AGGREGATE_CACHE_SIZE:
+                self._aggregates.pop(next(iter(self._aggregates)))
+            self._aggregates[cache_key] = groups
+        return groups
+
+    def search(self, q: str | None, fuzzy: bool = False) -> list[dict[str, Any]]:
+        """
+        Itens cujo name/title contém q (sem diferenciar maiúsculas), na ordem original.
+        fuzzy=True: tolera erros de digitação e ordena por relevância.
+        """
+        if not q or not q.strip():
+            return self.items
+        if fuzzy:
+            return [self.items[i] for i, _ in self.name_index.fuzzy(q)]
+        return [self.items[i] for i in self.name_index.search(q)]
+
+
+_STORE: dict[str, Collection] = {}
+_BY_URL: dict[str, dict[str, Any]] = {}
+_version = 0
+# Sequência única de versões de coleção (espelho e coleções locais do dataset): uma versão nunca
+# identifica dois snapshots diferentes, e é disso que os cursores de paginação dependem
+_last_version = 0
+
+
+def get(resource: str) -> Collection | None:
+    return _STORE.get(resource)
+
+
+def lookup(url: str) -> dict[str, Any] | None:
+    return _BY_URL.get(url)
+
+
+def version() -> int:
+    return _version
+
+
+def next_version() -> int:
+    global _last_version
+    _last_version += 1
+    return _last_version
+
+
+def clear() -> None:
+    global _STORE, _BY_URL, _version, _last_version
+    _STORE = {}
+    _BY_URL = {}
+    _version = 0
+    _last_version = 0
+
+
+async def _crawl(resource: str) -> list[dict[str, Any]]:
+    # sem cache e sem teto de páginas: o espelho precisa da coleção inteira e atual
+    items, _ = await swapi_client.acollect(f"{SWAPI_BASE_URL}/{resource}/", swapi_client.aget_json, max_pages=None)
+    return items
+
+
+async def refresh() -> None:
+    """Baixa todas as coleções em paralelo e só então troca o conteúdo do espelho de uma vez."""
+    crawled = await asyncio.gather(*(_crawl(r) for r in RESOURCES))
+    load(dict(zip(RESOURCES, crawled)), next_version())
+
+
+def load(collections: dict[str, list[dict[str, Any]]], new_version: int) -> None:
+    """Instala um conjunto completo de coleções (do crawl ou de um snapshot em disco)."""
+    global _STORE, _BY_URL, _version, _last_version
+    store = {r: Collection(r, items, new_version) for r, items in collections.items()}
+    for r, items in collections.items():
+        known_ids.record(r, items)
+    _BY_URL = {url: it for c in store.values() for url, it in c.by_url.items()}
+    _STORE = store
+    _version = new_version
+    _last_version = max(_last_version, new_version)
+    logger.info("SWAPI mirror v%s loaded: %s", new_version, {r: len(c.items) for r, c in store.items()})
+
+
+def export() -> dict[str, list[dict[str, Any]]]:
+    return {r: c.items for r, c in _STORE.items()}
+
+
+async def run_refresh_loop(interval: int = MIRROR_REFRESH_SECONDS, refresh_now: bool = False) -> None:
+    if not refresh_now:
+        await asyncio.sleep(interval)
+    while True:
+        try:
+            await refresh()
+        except Exception:
+            # mantém o espelho anterior; tenta de novo no próximo ciclo
+            logger.exception("SWAPI mirror refresh failed")
+        await asyncio.sleep(interval)
+
+
+async def start(crawl: bool = True) -> asyncio.Task:
+    """
+    Carga inicial (no startup) + task de atualização periódica.
+    crawl=False quando o espelho já veio de um snapshot em disco: sobe sem esperar o upstream
+    e atualiza em background.
+    """
+    if crawl:
+        try:
+            await refresh()
+        except Exception:
+            # sem espelho as rotas continuam funcionando via upstream/cache
+            logger.exception("SWAPI mirror initial crawl failed")
+    return asyncio.create_task(run_refresh_loop(refresh_now=not crawl))
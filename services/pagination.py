@@ -0,0 +1,101 @@
+import base64
+import binascii
+import hashlib
+import json
+from collections.abc import Sequence
+from typing import Any, Callable
+
+import numpy as np
+from fastapi import HTTPException
+
+from services.mirror import Collection
+
+# Cursor opaco das listagens: base64 de [versão do dataset, hash da consulta, quantos itens já
+# foram entregues, (chave, índice) do último item quando há ordenação]. A próxima página sai da
+# mesma versão da coleção, mesmo que o cache/espelho tenha sido atualizado no meio.
+
+
+class Cursor:
+    __slots__ = ("version", "query", "offset", "after")
+
+    def __init__(self, version: int | None, query: str, offset: int, after: tuple[int, int] | None = None):
+        self.version = version
+        self.query = query
+        self.offset = offset
+        self.after = after
+
+    def encode(self) -> str:
+        raw = json.dumps([self.version, self.query, self.offset, self.after], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def query_hash(*params: Any) -> str:
+    """Identifica a consulta (recurso, q, filter, sort...): um cursor só vale para a consulta que o gerou."""
+    return hashlib.blake2b(json.dumps(params).encode(), digest_size=8).hexdigest()
+
+
+def decode(token: str | None, query: str) -> Cursor | None:
+    if token is None:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        version, token_query, offset, after = json.loads(raw)
+        cursor = Cursor(
+            None if version is None else int(version),
+            str(token_query),
+            int(offset),
+            None if after is None else (int(after[0]), int(after[1])),
+        )
+    except (binascii.Error, ValueError, TypeError, IndexError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor.query != query or cursor.offset < 0:
+        raise HTTPException(status_code=400, detail="Cursor does not match this query")
+    return cursor
+
+
+def paginate(
+    collection: Collection,
+    items: list[dict[str, Any]],
+    cursor: Cursor | None,
+    page: int,
+    limit: int,
+    query: str,
+    ordered: Callable[[int], Sequence[dict[str, Any]]],
+    sort: tuple[str, Callable[[Any], Any], bool] | None = None,
+) -> tuple[list[dict[str, Any]], str | None]:
+    """
+    Uma página de `items` (já filtrados) + o cursor da seguinte (None na última).
+    `ordered(stop)` devolve os itens na ordem pedida (pelo menos os `stop` primeiros);
+    `sort` = (campo, chave, reverse) quando há ordenação.
+    Com cursor sobre um subconjunto ordenado a página vem por keyset (O(n) vetorizado + O(limit log limit)),
+    sem ordenar de novo tudo o que veio antes; nos outros casos a ordem já é um recorte barato.
+    """
+    start = cursor.offset if cursor else (page - 1) * limit
+    keyset = sort is not None and items is not collection.items
+
+    if keyset and cursor is not None and cursor.after is not None:
+        field, key, reverse = sort
+        picked = collection.page_after(items, field, key, reverse, cursor.after, limit)
+        paged = [items[i] for i in picked]
+    else:
+        paged = list(ordered(start + limit)[start:start + limit])
+
+    offset = start + len(paged)
+    if not paged or offset >= len(items):
+        return paged, None
+
+    after = None
+    if keyset:
+        field, key, reverse = sort
+        keys, positions = collection.sort_keys(items, field, key, reverse)
+        last_index = int(np.flatnonzero(positions == collection.position(paged[-1]))[0])
+        after = (int(keys[last_index]), last_index)
+    return paged, Cursor(collection.version, query, offset, after).encode()
+
+
+def next_upstream_cursor(query: str, start: int, returned: int, count: int) -> str | None:
+    """Cursor de uma página servida direto do upstream: sem versão, a próxima página já fixa uma."""
+    offset = start + returned
+    if not returned or offset >= count:
+        return None
+    return Cursor(None, query, offset).encode()
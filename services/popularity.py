@@ -0,0 +1,21 @@
+import threading
+from collections import Counter
+
+# Acessos por item (recurso, id) desde o início do processo.
+# Usado para ordenar as sugestões do autocomplete pelos itens mais procurados.
+_HITS: Counter[tuple[str, int]] = Counter()
+_lock = threading.Lock()
+
+
+def record(resource: str, item_id: int) -> None:
+    with _lock:
+        _HITS[(resource, item_id)] += 1
+
+
+def hits(resource: str, item_id: int | None) -> int:
+    return _HITS.get((resource, item_id), 0)
+
+
+def clear() -> None:
+    with _lock:
+        _HITS.clear()
@@ -0,0 +1,164 @@
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Any
+
+# Tamanho máximo dos n-gramas indexados
+NGRAM = 3
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: Any) -> str:
+    return str(text or "").strip().lower()
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text)
+
+
+def max_edits(word: str) -> int:
+    """Erros de digitação tolerados por palavra: nenhum até 2 letras, 1 até 5, 2 acima disso."""
+    if len(word) <= 2:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+
+def bounded_levenshtein(a: str, b: str, k: int) -> int | None:
+    """Distância de edição entre a e b se for <= k; None se passar de k (para cedo, só a faixa da diagonal)."""
+    if abs(len(a) - len(b)) > k:
+        return None
+    if a == b:
+        return 0
+    inf = k + 1
+    prev = [j if j <= k else inf for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        lo = max(1, i - k)
+        hi = min(len(b), i + k)
+        cur = [inf] * (len(b) + 1)
+        cur[0] = i if i <= k else inf
+        for j in range(lo, hi + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost, inf)
+        if min(cur[lo - 1:hi + 1]) > k:
+            return None
+        prev = cur
+    return prev[len(b)] if prev[len(b)] <= k else None
+
+
+class NgramIndex:
+    """
+    Índice invertido de n-gramas (1 a NGRAM caracteres) sobre um texto por item (name/title).
+    Busca por substring: consultas de até NGRAM caracteres saem direto da lista do n-grama;
+    as maiores intersectam as listas dos seus trigramas e confirmam com `in` só nos candidatos.
+    Devolve posições, na ordem original dos itens.
+    """
+
+    def __init__(self, texts: list[Any]):
+        self.texts = [normalize(t) for t in texts]
+        self.tokens = [tokenize(t) for t in self.texts]
+        postings: dict[str, set[int]] = defaultdict(set)
+        for i, text in enumerate(self.texts):
+            for n in range(1, NGRAM + 1):
+                for j in range(len(text) - n + 1):
+                    postings[text[j:j + n]].add(i)
+        self.postings: dict[str, tuple[int, ...]] = {g: tuple(sorted(ids)) for g, ids in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def search(self, q: str | None) -> list[int]:
+        needle = normalize(q)
+        if not needle:
+            return list(range(len(self.texts)))
+        if len(needle) <= NGRAM:
+            return list(self.postings.get(needle, ()))
+
+        # começa pela lista mais curta: a interseção só encolhe
+        grams = sorted({needle[j:j + NGRAM] for j in range(len(needle) - NGRAM + 1)}, key=self._df)
+        candidates = set(self.postings.get(grams[0], ()))
+        for gram in grams[1:]:
+            if not candidates:
+                return []
+            candidates.intersection_update(self.postings.get(gram, ()))
+        return [i for i in sorted(candidates) if needle in self.texts[i]]
+
+    def fuzzy(self, q: str | None) -> list[tuple[int, float]]:
+        """
+        Busca tolerante a erros de digitação: [(posição, score)] do mais para o menos relevante.
+        Candidatos saem das listas de trigramas (e bigramas, para palavras curtas) das palavras de q;
+        cada palavra de q precisa casar com alguma palavra do item como substring ou por Levenshtein
+        limitado a max_edits. score = 1 - edições / letras da consulta (1.0 = sem erro).
+        """
+        words = tokenize(normalize(q))
+        if not words:
+            return []
+
+        overlap: Counter[int] = Counter()
+        for word in words:
+            grams = {word[j:j + NGRAM] for j in range(len(word) - NGRAM + 1)}
+            if len(word) <= NGRAM + 1:
+                grams |= {word[j:j + 2] for j in range(len(word) - 1)} or {word}
+            for gram in grams:
+                overlap.update(self.postings.get(gram, ()))
+
+        letters = sum(len(w) for w in words)
+        ranked: list[tuple[float, int, int]] = []
+        for i, shared in overlap.items():
+            edits = self._edits(words, self.tokens[i])
+            if edits is not None:
+                ranked.append((1 - edits / letters, shared, i))
+
+        # mais relevante primeiro; empate: mais n-gramas em comum, depois a ordem original
+        ranked.sort(key=lambda r: (-r[0], -r[1], r[2]))
+        return [(i, round(score, 3)) for score, _, i in ranked]
+
+    @staticmethod
+    def _edits(words: list[str], tokens: list[str]) -> int | None:
+        total = 0
+        for word in words:
+            k = max_edits(word)
+            best: int | None = None
+            for token in tokens:
+                d = 0 if word in token else bounded_levenshtein(word, token, k)
+                if d is not None and (best is None or d < best):
+                    best = d
+                    if d == 0:
+                        break
+            if best is None:
+                return None
+            total += best
+        return total
+
+    def _df(self, gram: str) -> int:
+        return len(self.postings.get(gram, ()))
+
+
+class PrefixIndex:
+    """
+    Array ordenado de (sufixo a partir do início de cada palavra, posição) para autocomplete:
+    "sky" encontra "Luke Skywalker". Busca binária até o primeiro sufixo >= prefixo e segue
+    enquanto os sufixos começarem com ele.
+    """
+
+    def __init__(self, texts: list[Any]):
+        entries: list[tuple[str, int]] = []
+        for i, text in enumerate(normalize(t) for t in texts):
+            for m in _TOKEN_RE.finditer(text):
+                entries.append((text[m.start():], i))
+        entries.sort()
+        self.keys = [k for k, _ in entries]
+        self.positions = [i for _, i in entries]
+
+    def search(self, prefix: str | None) -> list[int]:
+        """Posições (sem repetir) cujo texto tem alguma palavra começando por prefix."""
+        needle = normalize(prefix)
+        if not needle:
+            return []
+        found: dict[int, None] = {}
+        for j in range(bisect_left(self.keys, needle), len(self.keys)):
+            if not self.keys[j].startswith(needle):
+                break
+            found[self.positions[j]] = None
+        return list(found)
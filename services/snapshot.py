@@ -0,0 +1,119 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from services import cache, mirror
+
+logger = logging.getLogger(__name__)
+
+# Snapshot em disco (SQLite) do espelho e do cache, para um restart/redeploy já subir aquecido.
+# Sem SWAPI_SNAPSHOT_PATH o recurso fica desligado.
+SNAPSHOT_PATH = os.getenv("SWAPI_SNAPSHOT_PATH")
+SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("SWAPI_SNAPSHOT_MAX_AGE_SECONDS", "86400"))
+SNAPSHOT_SAVE_SECONDS = int(os.getenv("SWAPI_SNAPSHOT_SAVE_SECONDS", "300"))
+
+# Sobe quando o formato do arquivo muda; snapshots de outra versão são ignorados
+SNAPSHOT_FORMAT_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE mirror (resource TEXT PRIMARY KEY, items TEXT NOT NULL);
+CREATE TABLE cache (url TEXT PRIMARY KEY, soft_expires_at REAL NOT NULL, expires_at REAL NOT NULL, value TEXT NOT NULL);
+"""
+
+# Um save por vez: o do loop (em thread) pode ainda estar rodando quando o shutdown chama save()
+_save_lock = threading.Lock()
+
+
+def save(path: str | None = None) -> None:
+    """Grava num arquivo temporário e troca de uma vez (um snapshot nunca fica pela metade)."""
+    path = path or SNAPSHOT_PATH
+    if not path:
+        return
+
+    with _save_lock:
+        _write(path)
+
+
+def _write(path: str) -> None:
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(_SCHEMA)
+        conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [
+                ("format_version", str(SNAPSHOT_FORMAT_VERSION)),
+                ("saved_at", str(time.time())),
+                ("mirror_version", str(mirror.version())),
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO mirror (resource, items) VALUES (?, ?)",
+            [(r, json.dumps(items)) for r, items in mirror.export().items()],
+        )
+        conn.executemany(
+            "INSERT INTO cache (url, soft_expires_at, expires_at, value) VALUES (?, ?, ?, ?)",
+            [(url, soft, hard, json.dumps(value)) for url, soft, hard, value in cache.entries()],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, path)
+
+
+def load(path: str | None = None, restore_mirror: bool = mirror.MIRROR_ENABLED) -> bool:
+    """
+    Restaura espelho (só se o modo espelho estiver ligado) e cache a partir do snapshot.
+    Devolve True se o espelho foi restaurado. Arquivo ausente, de outra versão ou velho demais é ignorado.
+    """
+    path = path or SNAPSHOT_PATH
+    if not path or not os.path.exists(path):
+        return False
+
+    try:
+        conn = sqlite3.connect(path)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            if meta.get("format_version") != str(SNAPSHOT_FORMAT_VERSION):
+                logger.warning("Ignoring snapshot %s: format version %s", path, meta.get("format_version"))
+                return False
+            if time.time() - float(meta.get("saved_at", 0)) > SNAPSHOT_MAX_AGE_SECONDS:
+                logger.warning("Ignoring snapshot %s: older than %ss", path, SNAPSHOT_MAX_AGE_SECONDS)
+                return False
+
+            collections = {r: json.loads(items) for r, items in conn.execute("SELECT resource, items FROM mirror")}
+            cached = conn.execute("SELECT url, soft_expires_at, expires_at, value FROM cache ORDER BY rowid").fetchall()
+        finally:
+            conn.close()
+    except (sqlite3.Error, ValueError):
+        logger.exception("Ignoring unreadable snapshot %s", path)
+        return False
+
+    now = time.time()
+    for url, soft_expires_at, expires_at, value in cached:
+        if expires_at > now:
+            # o que já passou do soft volta como stale e é revalidado na primeira leitura
+            cache.restore(url, json.loads(value), soft_expires_at, expires_at)
+
+    restored = restore_mirror and set(collections) == set(mirror.RESOURCES)
+    if restored:
+        mirror.load(collections, int(meta.get("mirror_version", 0)))
+    return restored
+
+
+async def run_save_loop(interval: int = SNAPSHOT_SAVE_SECONDS) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(save)
+        except Exception:
+            logger.exception("Snapshot save failed")
@@ -0,0 +1,327 @@
+import asyncio
+import contextvars
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, TypeVar
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
+
+# Ponto único de configuração do upstream (SWAPI)
+SWAPI_BASE_URL = os.getenv("SWAPI_BASE_URL", "https://swapi.dev/api").rstrip("/")
+SWAPI_CONNECT_TIMEOUT = float(os.getenv("SWAPI_CONNECT_TIMEOUT", "3"))
+SWAPI_READ_TIMEOUT = float(os.getenv("SWAPI_READ_TIMEOUT", "10"))
+
+# pool_connections: quantos hosts distintos ficam com pool aberto
+# pool_maxsize: conexões keep-alive por host (com pool_block, também é o limite por host)
+SWAPI_POOL_CONNECTIONS = int(os.getenv("SWAPI_POOL_CONNECTIONS", "4"))
+SWAPI_POOL_MAXSIZE = int(os.getenv("SWAPI_POOL_MAXSIZE", "20"))
+SWAPI_POOL_BLOCK = os.getenv("SWAPI_POOL_BLOCK", "1") == "1"
+
+# Máximo de buscas simultâneas ao resolver relacionamentos (expand)
+SWAPI_FANOUT_LIMIT = int(os.getenv("SWAPI_FANOUT_LIMIT", "10"))
+
+# Teto de páginas do upstream percorridas por listagem (10 itens por página na SWAPI)
+SWAPI_MAX_PAGES = int(os.getenv("SWAPI_MAX_PAGES", "10"))
+
+# Novas tentativas para GETs que falham por rede ou 5xx, com backoff exponencial e jitter
+SWAPI_RETRIES = int(os.getenv("SWAPI_RETRIES", "2"))
+SWAPI_RETRY_BACKOFF = float(os.getenv("SWAPI_RETRY_BACKOFF", "0.2"))
+
+# Circuit breaker por host do upstream: abre após N falhas seguidas e falha rápido (503)
+# até SWAPI_BREAKER_RESET_SECONDS; depois deixa passar uma chamada de teste.
+SWAPI_BREAKER_FAILURES = int(os.getenv("SWAPI_BREAKER_FAILURES", "5"))
+SWAPI_BREAKER_RESET_SECONDS = float(os.getenv("SWAPI_BREAKER_RESET_SECONDS", "30"))
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _build_session() -> requests.Session:
+    adapter = HTTPAdapter(
+        pool_connections=SWAPI_POOL_CONNECTIONS,
+        pool_maxsize=SWAPI_POOL_MAXSIZE,
+        pool_block=SWAPI_POOL_BLOCK,
+    )
+    s = requests.Session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def _build_async_client() -> httpx.AsyncClient:
+    # O upstream é um host só, então o limite total do httpx equivale ao limite por host
+    limits = httpx.Limits(
+        max_connections=SWAPI_POOL_MAXSIZE,
+        max_keepalive_connections=SWAPI_POOL_MAXSIZE,
+    )
+    timeout = httpx.Timeout(SWAPI_READ_TIMEOUT, connect=SWAPI_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+# Sessão compartilhada por todos os routers (keep-alive, sem novo handshake TLS por chamada)
+session = _build_session()
+
+# Equivalente assíncrono, usado pelas rotas async def (não bloqueia o event loop)
+async_client = _build_async_client()
+
+# Threads para o fan-out das rotas def (que já rodam no threadpool do FastAPI)
+_fanout_pool = ThreadPoolExecutor(max_workers=SWAPI_FANOUT_LIMIT, thread_name_prefix="swapi-fanout")
+
+
+class CircuitBreaker:
+    """
+    closed: tudo passa. open (após `failure_threshold` falhas seguidas): tudo falha na hora.
+    Passados `reset_timeout` s, half-open: uma única chamada de teste decide se fecha ou reabre.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = SWAPI_BREAKER_FAILURES,
+        reset_timeout: float = SWAPI_BREAKER_RESET_SECONDS,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.time() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at >= self.reset_timeout and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(url: str) -> CircuitBreaker:
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker()
+        return breaker
+
+
+def reset_breakers() -> None:
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def _backoff(attempt: int) -> float:
+    # "full jitter": espera aleatória até o teto exponencial, para as réplicas não tentarem juntas
+    return random.uniform(0, SWAPI_RETRY_BACKOFF * 2**attempt)
+
+
+def _circuit_open() -> HTTPException:
+    return HTTPException(status_code=503, detail="Upstream unavailable (circuit open)")
+
+
+def _raise_for_status(status_code: int) -> None:
+    if status_code == 404:
+        raise HTTPException(status_code=404, detail="Resource not found")
+    if status_code >= 400:
+        raise HTTPException(status_code=502, detail="Upstream returned error")
+
+
+def _fetch_json(url: str) -> Any:
+    breaker = breaker_for(url)
+    for attempt in range(SWAPI_RETRIES + 1):
+        if attempt:
+            time.sleep(_backoff(attempt - 1))
+        if not breaker.allow():
+            raise _circuit_open()
+        try:
+            resp = session.get(url, timeout=(SWAPI_CONNECT_TIMEOUT, SWAPI_READ_TIMEOUT))
+        except requests.RequestException:
+            breaker.record_failure()
+            error = HTTPException(status_code=502, detail="Upstream request failed")
+            continue
+        if resp.status_code >= 500:
+            breaker.record_failure()
+            error = HTTPException(status_code=502, detail="Upstream returned error")
+            continue
+
+        # 4xx é resposta válida do upstream: não conta como falha nem é repetida
+        breaker.record_success()
+        _raise_for_status(resp.status_code)
+        return resp.json()
+    raise error
+
+
+async def _afetch_json(url: str) -> Any:
+    breaker = breaker_for(url)
+    for attempt in range(SWAPI_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(_backoff(attempt - 1))
+        if not breaker.allow():
+            raise _circuit_open()
+        try:
+            resp = await async_client.get(url)
+        except httpx.HTTPError:
+            breaker.record_failure()
+            error = HTTPException(status_code=502, detail="Upstream request failed")
+            continue
+        if resp.status_code >= 500:
+            breaker.record_failure()
+            error = HTTPException(status_code=502, detail="Upstream returned error")
+            continue
+
+        breaker.record_success()
+        _raise_for_status(resp.status_code)
+        return resp.json()
+    raise error
+
+
+# Single-flight: enquanto uma busca de uma URL está em andamento, quem pedir a mesma URL
+# espera por ela e recebe o mesmo resultado (ou o mesmo erro), em vez de ir ao upstream.
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+_ainflight: dict[str, asyncio.Task] = {}
+
+
+def get_json(url: str) -> Any:
+    with _inflight_lock:
+        call = _inflight.get(url)
+        leader = call is None
+        if leader:
+            call = _inflight[url] = Future()
+
+    if not leader:
+        return call.result()
+
+    try:
+        call.set_result(_fetch_json(url))
+    except BaseException as exc:
+        call.set_exception(exc)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(url, None)
+    return call.result()
+
+
+async def aget_json(url: str) -> Any:
+    task = _ainflight.get(url)
+    if task is None:
+        task = asyncio.ensure_future(_afetch_json(url))
+        _ainflight[url] = task
+        task.add_done_callback(lambda t: _ainflight.pop(url, None) if _ainflight.get(url) is t else None)
+    # shield: se um dos interessados for cancelado, a busca continua para os demais
+    return await asyncio.shield(task)
+
+
+def map_limited(fn: Callable[[T], R], items: Iterable[T]) -> list[R]:
+    """
+    Aplica fn em paralelo (no máximo SWAPI_FANOUT_LIMIT por vez), mantendo a ordem.
+    Cada chamada roda numa cópia do contexto da requisição (ex: a lista de URLs servidas stale).
+    """
+    futures = [_fanout_pool.submit(contextvars.copy_context().run, fn, item) for item in items]
+    return [f.result() for f in futures]
+
+
+async def gather_limited(aws: Iterable[Awaitable[T]], limit: int = SWAPI_FANOUT_LIMIT) -> list[T]:
+    """asyncio.gather com no máximo `limit` awaitables em andamento, mantendo a ordem."""
+    sem = asyncio.Semaphore(limit)
+
+    async def run(aw: Awaitable[T]) -> T:
+        async with sem:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws))
+
+
+def page_url(base_url: str, page: int) -> str:
+    """URL da página `page` de uma listagem da SWAPI (mesmo formato dos links `next`)."""
+    if page == 1:
+        return base_url
+    sep = "&" if "?" in base_url else "?"
+    return f"{base_url}{sep}page={page}"
+
+
+async def acollect(
+    base_url: str,
+    fetch: Callable[[str], Awaitable[Any]],
+    start: int = 0,
+    end: int | None = None,
+    max_pages: int | None = SWAPI_MAX_PAGES,
+) -> tuple[list[dict[str, Any]], int]:
+    """
+    Busca os itens [start:end) de uma listagem paginada da SWAPI (end=None = coleção inteira).
+    A página 1 traz `count`; com ele calculamos quais páginas cobrem o intervalo
+    e buscamos todas em paralelo. Devolve (itens, total).
+    max_pages=None remove o teto de páginas.
+    """
+    max_pages = max_pages or math.inf
+    first = await fetch(base_url)
+    results = first.get("results", [])
+    if not isinstance(results, list):
+        return [], 0
+
+    count = first.get("count")
+    page_size = len(results)
+
+    if not isinstance(count, int) or not page_size:
+        # sem count não dá para calcular as páginas: segue os links `next`
+        collected = list(results)
+        next_url = first.get("next")
+        pages = 1
+        while next_url and (end is None or len(collected) < end) and pages < max_pages:
+            data = await fetch(next_url)
+            collected.extend(data.get("results", []))
+            next_url = data.get("next")
+            pages += 1
+        return collected[start:end], len(collected)
+
+    stop = count if end is None else min(end, count)
+    first_page = start // page_size + 1
+    last_page = int(min(math.ceil(stop / page_size), max_pages))
+    if first_page > last_page:
+        return [], count
+
+    others = await gather_limited(fetch(page_url(base_url, n)) for n in range(max(first_page, 2), last_page + 1))
+
+    collected = list(results) if first_page == 1 else []
+    for data in others:
+        collected.extend(data.get("results", []))
+
+    offset = (first_page - 1) * page_size
+    return collected[start - offset:stop - offset], count
+
+
+async def aclose() -> None:
+    await async_client.aclose()
@@ -0,0 +1,48 @@
+import heapq
+from typing import Any, Callable, Sequence, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+# Seleção parcial (heap) só compensa quando os itens pedidos são poucos perto do total;
+# acima dessa fração, ordenar tudo (Timsort, em C) sai mais barato.
+TOPK_MAX_RATIO = 0.25
+
+
+def sorted_prefix(
+    items: Sequence[T],
+    key: Callable[[T], Any],
+    reverse: bool = False,
+    stop: int | None = None,
+) -> list[T]:
+    """
+    Os `stop` primeiros de sorted(items, key=key, reverse=reverse), na mesma ordem (estável).
+    stop=None (ou grande demais perto de len(items)) = ordena tudo.
+    """
+    if stop is not None and stop < len(items) * TOPK_MAX_RATIO:
+        # O(n log k): heapq.nsmallest/nlargest equivalem a sorted(...)[:k], inclusive nos empates
+        pick = heapq.nlargest if reverse else heapq.nsmallest
+        return pick(stop, items, key=key)
+    return sorted(items, key=key, reverse=reverse)
+
+
+def top_indices(values: np.ndarray, candidates: np.ndarray, n: int, reverse: bool = False) -> np.ndarray:
+    """
+    Os `n` de `candidates` (índices crescentes, sem NaN em `values`) com menor `values[i]`
+    (reverse=True: maior), já em ordem; empates seguem a ordem original, como no sorted().
+    argpartition separa os `n` em O(len(candidates)) e só eles são ordenados.
+    """
+    keys = -values[candidates] if reverse else values[candidates]
+    if n <= 0:
+        return candidates[:0]
+    if n < len(keys):
+        cutoff = keys[np.argpartition(keys, n - 1)[n - 1]]
+        # tudo abaixo do n-ésimo valor entra; os empatados com ele, pela posição original
+        below = np.flatnonzero(keys < cutoff)
+        ties = np.flatnonzero(keys == cutoff)[: n - len(below)]
+        picked = np.concatenate([below, ties])
+    else:
+        picked = np.arange(len(keys))
+    order = np.lexsort((picked, keys[picked]))
+    return candidates[picked[order]]
@@ -1,4 +1,6 @@
+import httpx
 import pytest
+import requests
 from fastapi.testclient import TestClient
 
 from main import app
@@ -21,25 +23,55 @@ def auth_off(monkeypatch):
     yield
 
 
+class Resp:
+    """Resposta fake da SWAPI para o mock_swapi: Resp(data) ou Resp(data, status_code)."""
+
+    def __init__(self, data=None, status_code=200):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+@pytest.fixture
+def mock_swapi(monkeypatch):
+    """
+    Troca o GET dos clients compartilhados da SWAPI (sync e async) por um fake.
+    Uso: mock_swapi(fake_get), onde fake_get(url, timeout) devolve um objeto com status_code e json().
+    """
+    from services import swapi_client
+
+    def install(fake_get):
+        def handler(request: httpx.Request) -> httpx.Response:
+            try:
+                resp = fake_get(str(request.url), timeout=10)
+            except requests.RequestException as exc:
+                raise httpx.ConnectError(str(exc), request=request)
+            return httpx.Response(resp.status_code, json=resp.json())
+
+        monkeypatch.setattr(swapi_client.session, "get", fake_get)
+        monkeypatch.setattr(
+            swapi_client, "async_client", httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        )
+
+    return install
+
+
 @pytest.fixture(autouse=True)
-def clear_router_caches():
+def reset_cache(monkeypatch):
     """
-    Zera o cache em memória entre testes.
-    Sem isso, monkeypatch do requests.get não funciona porque o cache devolve 200 antigo.
+    Zera o cache compartilhado (e o espelho da SWAPI) entre testes.
+    Sem isso, o mock_swapi não funciona porque o cache devolve 200 antigo.
+    Também fecha os circuit breakers e tira a espera entre retries.
     """
-    from routers import (
-        films_router,
-        people_router,
-        planets_router,
-        species_router,
-        starships_router,
-        vehicles_router,
-    )
-
-    films_router._CACHE.clear()
-    people_router._CACHE.clear()
-    planets_router._CACHE.clear()
-    species_router._CACHE.clear()
-    starships_router._CACHE.clear()
-    vehicles_router._CACHE.clear()
+    from services import cache, dataset, known_ids, mirror, popularity, swapi_client
+
+    cache.clear()
+    mirror.clear()
+    dataset.clear()
+    popularity.clear()
+    known_ids.clear()
+    swapi_client.reset_breakers()
+    monkeypatch.setattr(swapi_client, "_backoff", lambda attempt: 0)
     yield
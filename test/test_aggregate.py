@@ -0,0 +1,70 @@
+from conftest import Resp
+from services import mirror
+
+HUMAN = "https://swapi.dev/api/species/1/"
+DROID = "https://swapi.dev/api/species/2/"
+
+PEOPLE = [
+    {"name": "Luke Skywalker", "gender": "male", "height": "172", "mass": "77", "species": [], "url": "https://swapi.dev/api/people/1/"},
+    {"name": "C-3PO", "gender": "n/a", "height": "167", "mass": "75", "species": [DROID], "url": "https://swapi.dev/api/people/2/"},
+    {"name": "R2-D2", "gender": "n/a", "height": "96", "mass": "32", "species": [DROID], "url": "https://swapi.dev/api/people/3/"},
+    {"name": "Leia Organa", "gender": "female", "height": "150", "mass": "unknown", "species": [HUMAN], "url": "https://swapi.dev/api/people/5/"},
+    {"name": "Han Solo", "gender": "Male", "height": "180", "mass": "80", "species": [HUMAN], "url": "https://swapi.dev/api/people/14/"},
+]
+
+
+def _by_key(body):
+    return {g["key"]: g for g in body["groups"]}
+
+
+def test_group_by_scalar_field(client, auth_off, mock_swapi):
+    mock_swapi(lambda url, timeout=10: Resp({"count": len(PEOPLE), "results": PEOPLE, "next": None}))
+
+    res = client.get("/aggregate", params={"resource": "people", "group_by": "gender", "metrics": "count,avg:height,max:mass,count:mass"})
+    assert res.status_code == 200
+    body = res.json()
+    assert [g["key"] for g in body["groups"]] == ["male", "n/a", "female"]
+    groups = _by_key(body)
+    assert groups["male"] == {"key": "male", "count": 2, "avg_height": 176, "max_mass": 80, "count_mass": 2}
+    assert groups["n/a"]["avg_height"] == 131.5
+    # sem nenhum valor numérico no grupo a métrica vem nula
+    assert groups["female"]["max_mass"] is None
+    assert groups["female"]["count_mass"] == 0
+
+
+def test_group_by_list_field_and_filter(client, auth_off, mock_swapi):
+    mock_swapi(lambda url, timeout=10: Resp({"count": len(PEOPLE), "results": PEOPLE, "next": None}))
+
+    body = client.get("/aggregate", params={"resource": "people", "group_by": "species", "metrics": "avg:height"}).json()
+    groups = _by_key(body)
+    assert groups[DROID] == {"key": DROID, "count": 2, "avg_height": 131.5}
+    assert groups[HUMAN]["count"] == 2
+    assert groups[None]["count"] == 1
+
+    body = client.get("/aggregate", params={"resource": "people", "metrics": "sum:mass,min:height", "filter": "height>100"}).json()
+    assert body["groups"] == [{"key": None, "count": 4, "sum_mass": 232, "min_height": 150}]
+
+
+def test_invalid_metrics_are_400(client, auth_off, mock_swapi):
+    mock_swapi(lambda url, timeout=10: Resp({"count": len(PEOPLE), "results": PEOPLE, "next": None}))
+
+    invalid = [
+        {"metrics": "avg"},
+        {"metrics": "median:height"},
+        {"metrics": "avg:nope"},
+        {"metrics": "avg:name"},
+        {"group_by": "nope"},
+    ]
+    for params in invalid:
+        assert client.get("/aggregate", params={"resource": "people", **params}).status_code == 400
+
+
+def test_results_are_cached_per_dataset_version():
+    mirror.load({"people": PEOPLE}, 1)
+    first = mirror.get("people").aggregate("gender", "count,avg:height")
+    assert mirror.get("people").aggregate("gender", "count, avg:height") is first
+
+    mirror.load({"people": PEOPLE[:2]}, 2)
+    second = mirror.get("people").aggregate("gender", "count,avg:height")
+    assert second is not first
+    assert sum(g["count"] for g in second) == 2
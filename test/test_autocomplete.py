@@ -0,0 +1,46 @@
+from conftest import Resp
+from services.search_index import PrefixIndex
+
+
+def test_prefix_index_matches_start_of_any_word():
+    index = PrefixIndex(["Luke Skywalker", "Leia Organa", "Anakin Skywalker", "Lobot"])
+
+    assert sorted(index.search("l")) == [0, 1, 3]
+    assert sorted(index.search("sky")) == [0, 2]
+    assert index.search("org") == [1]
+    assert index.search("kywalker") == []
+    assert index.search("") == []
+
+
+def test_autocomplete_ranks_by_access_popularity(client, auth_off, mock_swapi):
+    people = [
+        {"name": "Luke Skywalker", "url": "https://swapi.dev/api/people/1/", "species": []},
+        {"name": "Leia Organa", "url": "https://swapi.dev/api/people/5/", "species": []},
+        {"name": "Lobot", "url": "https://swapi.dev/api/people/26/", "species": []},
+        {"name": "Han Solo", "url": "https://swapi.dev/api/people/14/", "species": []},
+    ]
+    by_url = {p["url"]: p for p in people}
+    mock_swapi(lambda url, timeout=10: Resp(by_url.get(url) or {"count": 4, "results": people, "next": None}))
+
+    res = client.get("/autocomplete?resource=people&prefix=l")
+    assert res.status_code == 200
+    assert [r["name"] for r in res.json()["results"]] == ["Leia Organa", "Lobot", "Luke Skywalker"]
+
+    client.get("/peoples/26")
+    client.get("/peoples/26")
+    client.get("/peoples/1")
+
+    body = client.get("/autocomplete?resource=people&prefix=L&limit=2").json()
+    assert body["results"] == [
+        {"id": 26, "name": "Lobot", "url": "https://swapi.dev/api/people/26/"},
+        {"id": 1, "name": "Luke Skywalker", "url": "https://swapi.dev/api/people/1/"},
+    ]
+
+
+def test_autocomplete_films_use_title(client, auth_off, mock_swapi):
+    films = [{"title": "A New Hope", "url": "https://swapi.dev/api/films/1/"}]
+    mock_swapi(lambda url, timeout=10: Resp({"count": 1, "results": films, "next": None}))
+
+    body = client.get("/autocomplete?resource=films&prefix=new").json()
+    assert body["results"] == [{"id": 1, "title": "A New Hope", "url": "https://swapi.dev/api/films/1/"}]
+    assert client.get("/autocomplete?resource=films").status_code == 422
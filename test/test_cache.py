@@ -0,0 +1,221 @@
+import asyncio
+import time
+
+from conftest import Resp
+from services import cache
+
+
+def test_cache_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+
+    cache.put("https://swapi.dev/api/planets/1/", {"name": "Tatooine"}, ttl=60)
+    assert cache.get("https://swapi.dev/api/planets/1/") == {"name": "Tatooine"}
+
+    # passado o TTL, ainda é servido como stale até o fim da janela de stale
+    now[0] += 61
+    assert cache.get("https://swapi.dev/api/planets/1/") == {"name": "Tatooine"}
+
+    now[0] += cache.CACHE_STALE_SECONDS
+    assert cache.get("https://swapi.dev/api/planets/1/") is None
+
+
+def test_lru_evicts_least_recently_used_over_max_entries():
+    c = cache.TTLCache(max_entries=2, max_bytes=10_000)
+    c.put("a", 1)
+    c.put("b", 2)
+    assert c.get("a") == 1  # "a" passa a ser o mais recente
+    c.put("c", 3)
+
+    assert c.get("b") is None
+    assert c.get("a") == 1
+    assert c.get("c") == 3
+
+
+def test_byte_budget_evicts_and_skips_oversized_values():
+    c = cache.TTLCache(max_entries=100, max_bytes=30)
+    c.put("a", "x" * 10)
+    c.put("b", "y" * 10)
+    assert len(c) == 2
+    c.put("c", "z" * 10)
+
+    assert c.get("a") is None
+    assert c.bytes <= 30
+
+    c.put("big", "w" * 100)
+    assert c.get("big") is None
+
+
+def test_expired_entries_are_swept_periodically(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    c = cache.TTLCache(max_entries=100, max_bytes=10_000, sweep_interval=30)
+
+    for i in range(10):
+        c.put(f"https://swapi.dev/api/people/?search={i}", {"results": []}, ttl=5)
+    now[0] += 31
+    c.put("https://swapi.dev/api/people/1/", {"name": "Luke"}, ttl=60)
+
+    assert len(c) == 1
+    assert c.bytes == cache._sizeof({"name": "Luke"})
+
+
+def test_planet_fetched_once_across_routers(client, auth_off, mock_swapi):
+    calls = []
+
+    def fake_get(url, timeout=10):
+        calls.append(url)
+        if url.endswith("/planets/1/"):
+            return Resp({"name": "Tatooine", "climate": "arid", "residents": [], "films": []})
+        if url.endswith("/people/1/"):
+            return Resp({"name": "Luke Skywalker", "homeworld": "https://swapi.dev/api/planets/1/", "species": []})
+        return Resp({})
+
+    mock_swapi(fake_get)
+
+    assert client.get("/planets/1").status_code == 200
+    res = client.get("/peoples/1?expand=homeworld")
+    assert res.status_code == 200
+    assert res.json()["result"]["homeworld"]["name"] == "Tatooine"
+    assert calls.count("https://swapi.dev/api/planets/1/") == 1
+
+
+def test_people_default_species_does_not_leak_into_cache(client, auth_off, mock_swapi):
+    mock_swapi(lambda url, timeout=10: Resp({"name": "Luke Skywalker", "species": []}))
+
+    res = client.get("/peoples/1")
+    assert res.json()["result"]["species"] == [{"name": "Human"}]
+    assert cache.get("https://swapi.dev/api/people/1/")["species"] == []
+
+
+def test_list_page_populates_detail_cache_by_url(client, auth_off, mock_swapi):
+    calls = []
+    luke = {
+        "name": "Luke Skywalker",
+        "homeworld": "https://swapi.dev/api/planets/1/",
+        "species": [],
+        "url": "https://swapi.dev/api/people/1/",
+    }
+    tatooine = {"name": "Tatooine", "climate": "arid", "url": "https://swapi.dev/api/planets/1/"}
+
+    def fake_get(url, timeout=10):
+        calls.append(url)
+        if url.endswith("/people/"):
+            return Resp({"count": 1, "results": [luke], "next": None})
+        if url.endswith("/planets/"):
+            return Resp({"count": 1, "results": [tatooine], "next": None})
+        return Resp({})
+
+    mock_swapi(fake_get)
+
+    assert client.get("/peoples/").status_code == 200
+    assert client.get("/planets/").status_code == 200
+    res = client.get("/peoples/1?expand=homeworld")
+
+    assert res.status_code == 200
+    assert res.json()["result"]["homeworld"]["name"] == "Tatooine"
+    assert calls == ["https://swapi.dev/api/people/", "https://swapi.dev/api/planets/"]
+
+
+def test_stale_entry_is_served_and_refreshed_in_background(monkeypatch):
+    url = "https://swapi.dev/api/planets/1/"
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    cache.put(url, {"name": "old"}, ttl=60)
+
+    async def fake_aget_json(u):
+        return {"name": "new"}
+
+    monkeypatch.setattr(cache.swapi_client, "aget_json", fake_aget_json)
+    now[0] += 61
+
+    async def run():
+        first = await cache.aget_json_cached(url)
+        await asyncio.gather(*cache._refresh_tasks)
+        return first
+
+    assert asyncio.run(run()) == {"name": "old"}
+    assert cache.get(url) == {"name": "new"}
+
+
+def test_popular_key_is_refreshed_ahead_of_expiry(monkeypatch):
+    url = "https://swapi.dev/api/planets/1/"
+    now = [1000.0]
+    calls = []
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    cache.put(url, {"name": "old"}, ttl=60)
+
+    def fake_get_json(u):
+        calls.append(u)
+        return {"name": "new"}
+
+    monkeypatch.setattr(cache.swapi_client, "get_json", fake_get_json)
+
+    # fora da janela de refresh-ahead: nenhuma ida ao upstream
+    for _ in range(cache.CACHE_REFRESH_AHEAD_HITS):
+        assert cache.get_json_cached(url) == {"name": "old"}
+    assert calls == []
+
+    now[0] += 60 - cache.CACHE_REFRESH_AHEAD_SECONDS + 1
+    assert cache.get_json_cached(url) == {"name": "old"}
+    while cache._refreshing:
+        time.sleep(0.01)
+    assert calls == [url]
+    assert cache.get(url) == {"name": "new"}
+
+
+def test_last_good_value_is_served_stale_when_upstream_fails(client, auth_off, mock_swapi, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    up = [True]
+
+    def fake_get(url, timeout=10):
+        if up[0]:
+            return Resp({"name": "Tatooine", "residents": [], "films": []})
+        return Resp({}, status_code=500)
+
+    mock_swapi(fake_get)
+    res = client.get("/planets/1")
+    assert res.status_code == 200
+    assert "Warning" not in res.headers
+
+    # bem depois da janela de stale-while-revalidate, com o upstream fora
+    up[0] = False
+    now[0] += 60 + cache.CACHE_STALE_SECONDS + 1
+    res = client.get("/planets/1")
+    assert res.status_code == 200
+    assert res.json()["result"]["name"] == "Tatooine"
+    assert res.headers["X-Cache"] == "STALE"
+    assert "Response is Stale" in res.headers["Warning"]
+
+
+def test_upstream_error_without_cached_value_still_fails(client, auth_off, mock_swapi):
+    mock_swapi(lambda url, timeout=10: Resp({}, status_code=500))
+    assert client.get("/planets/1").status_code == 502
+
+
+def test_stale_expanded_relation_marks_the_response(client, auth_off, mock_swapi, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    up = [True]
+    planet_url = "https://swapi.dev/api/planets/1/"
+    planet = {"name": "Tatooine", "residents": ["https://swapi.dev/api/people/1/"], "films": []}
+
+    def fake_get(url, timeout=10):
+        if not up[0]:
+            return Resp({}, status_code=500)
+        return Resp(planet if url == planet_url else {"name": "Luke Skywalker"})
+
+    mock_swapi(fake_get)
+    assert "Warning" not in client.get("/planets/1?expand=residents").headers
+
+    # só o resident venceu; o planeta está fresco. O resident é buscado nas threads do fan-out
+    up[0] = False
+    now[0] += 60 + cache.CACHE_STALE_SECONDS + 1
+    cache.put(planet_url, planet, ttl=600)
+
+    res = client.get("/planets/1?expand=residents")
+    assert res.status_code == 200
+    assert res.json()["result"]["residents"][0]["name"] == "Luke Skywalker"
+    assert res.headers["X-Cache"] == "STALE"
+    assert res.headers["Warning"] == '110 - "Response is Stale"'
@@ -0,0 +1,84 @@
+import fnmatch
+import time
+
+import pytest
+
+from services import cache, cache_backends
+
+
+class FakeRedis:
+    """Substituto local do servidor Redis (só a parte da API usada pelo RedisBackend)."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        value, expires_at = self.data.get(key, (None, 0))
+        return value if time.time() < expires_at else None
+
+    def set(self, key, value, px):
+        self.data[key] = (value, time.time() + px / 1000)
+
+    def scan_iter(self, match):
+        return [k for k in self.data if fnmatch.fnmatch(k, match)]
+
+    def delete(self, *keys):
+        for k in keys:
+            self.data.pop(k, None)
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def shared_backends(request, tmp_path):
+    """Dois backends apontando para o mesmo armazenamento, como dois workers no mesmo nó."""
+    if request.param == "sqlite":
+        path = str(tmp_path / "l2.db")
+        return cache_backends.from_url(f"sqlite:///{path}"), cache_backends.from_url(f"sqlite:///{path}")
+    server = FakeRedis()
+    return cache_backends.RedisBackend(server), cache_backends.RedisBackend(server)
+
+
+def test_l2_is_shared_between_processes_and_respects_expiry(shared_backends):
+    worker_a, worker_b = shared_backends
+
+    worker_a.set_many([("https://swapi.dev/api/planets/1/", {"name": "Tatooine"})], time.time() + 60)
+    worker_a.set_many([("https://swapi.dev/api/planets/2/", {"name": "Alderaan"})], time.time() - 1)
+
+    expires_at, value = worker_b.get("https://swapi.dev/api/planets/1/")
+    assert value == {"name": "Tatooine"}
+    assert expires_at > time.time()
+    assert worker_b.get("https://swapi.dev/api/planets/2/") is None
+
+    worker_b.clear()
+    assert worker_a.get("https://swapi.dev/api/planets/1/") is None
+
+
+def test_l1_miss_is_served_from_l2_and_promoted(monkeypatch):
+    server = FakeRedis()
+    monkeypatch.setattr(cache, "_L2", cache_backends.RedisBackend(server))
+
+    cache.put("https://swapi.dev/api/people/1/", {"name": "Luke Skywalker"}, ttl=60)
+    cache._CACHE.clear()  # simula outro worker: L1 vazio, L2 compartilhado
+
+    assert cache.get("https://swapi.dev/api/people/1/") == {"name": "Luke Skywalker"}
+    assert cache._CACHE.get("https://swapi.dev/api/people/1/") == {"name": "Luke Skywalker"}
+
+
+def test_l2_failures_do_not_break_requests(monkeypatch):
+    class Down:
+        def get(self, key):
+            raise ConnectionError("down")
+
+        def set_many(self, entries, expires_at):
+            raise ConnectionError("down")
+
+    monkeypatch.setattr(cache, "_L2", Down())
+
+    cache.put("https://swapi.dev/api/people/1/", {"name": "Luke Skywalker"}, ttl=60)
+    assert cache.get("https://swapi.dev/api/people/1/") == {"name": "Luke Skywalker"}
+    assert cache.get("https://swapi.dev/api/people/2/") is None
+
+
+def test_from_url_rejects_unknown_scheme():
+    assert cache_backends.from_url(None) is None
+    with pytest.raises(ValueError):
+        cache_backends.from_url("memcached://localhost")
@@ -0,0 +1,63 @@
+import random
+
+import numpy as np
+import pytest
+
+from services import columns, mirror
+
+
+def test_parse_number_handles_swapi_strings():
+    assert columns.parse_number("1,000,000") == 1_000_000
+    assert columns.parse_number(" 172 ") == 172
+    assert columns.parse_number("0.5") == 0.5
+    assert columns.parse_number(7) == 7.0
+    for null in ["unknown", "n/a", "none", "", None, "arid", True, ["1"]]:
+        assert columns.parse_number(null) is None
+
+
+def test_column_store_builds_typed_columns_with_null_masks():
+    store = columns.ColumnStore([
+        {"name": "Tatooine", "population": "200000", "films": []},
+        {"name": "Alderaan", "population": "2,000,000,000"},
+        {"name": "Yavin IV", "population": "unknown"},
+    ])
+
+    population = store.numeric_column("population")
+    assert population.values.dtype == np.float64
+    assert population.valid.tolist() == [True, True, False]
+    assert population.values[:2].tolist() == [200000.0, 2e9]
+    assert store.text_column("name").tolist() == ["tatooine", "alderaan", "yavin iv"]
+    assert "films" not in store.numeric
+    assert store.numeric_column("missing").valid.tolist() == [False, False, False]
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_vectorized_numeric_first_order_matches_python_key(reverse):
+    rnd = random.Random(7)
+    pool = ["10", "2", "1,000", "unknown", "n/a", None, "Arid", "arid ", "temperate", "0", "2.0", "-3"]
+    items = [{"name": f"item-{i}", "population": rnd.choice(pool)} for i in range(300)]
+    collection = mirror.Collection("test-columns", items, 1)
+
+    expected = sorted(items, key=lambda it: columns.numeric_first(it.get("population")), reverse=reverse)
+    assert list(collection.ordered("population", columns.numeric_first, reverse)) == expected
+
+
+def test_numeric_sort_is_by_value_not_by_string(client, auth_off, mock_swapi):
+    class Resp:
+        status_code = 200
+
+        def json(self):
+            planets = [
+                {"name": "A", "population": "1,000,000,000"},
+                {"name": "B", "population": "unknown"},
+                {"name": "C", "population": "200000"},
+                {"name": "D", "population": "30000000"},
+            ]
+            return {"count": 4, "results": planets, "next": None}
+
+    mock_swapi(lambda url, timeout=10: Resp())
+
+    res = client.get("/planets/?sort=population&order=desc")
+    assert [p["name"] for p in res.json()["results"]] == ["B", "A", "D", "C"]
+    res = client.get("/planets/?q=a&sort=population")
+    assert [p["name"] for p in res.json()["results"]] == ["A"]
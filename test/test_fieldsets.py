@@ -0,0 +1,103 @@
+from conftest import Resp
+from services import fieldsets
+
+
+def test_project_keeps_only_requested_paths():
+    fieldset = fieldsets.parse("name, homeworld.name,films.title,films")
+    item = {
+        "name": "Luke",
+        "height": "172",
+        "homeworld": {"name": "Tatooine", "climate": "arid"},
+        "films": [{"title": "A New Hope", "episode": 4}],
+    }
+
+    assert fieldsets.project(item, fieldset) == {
+        "name": "Luke",
+        "homeworld": {"name": "Tatooine"},
+        "films": [{"title": "A New Hope", "episode": 4}],
+    }
+    # relação não expandida (URL) passa como está
+    assert fieldsets.project({"homeworld": "https://swapi.dev/api/planets/1/"}, fieldset) == {
+        "homeworld": "https://swapi.dev/api/planets/1/"
+    }
+    assert fieldsets.parse("") is None
+    assert fieldsets.parse(" , .") is None
+    assert fieldsets.restrict({"films", "species"}, fieldset) == {"films"}
+    assert fieldsets.restrict({"films", "species"}, None) == {"films", "species"}
+    assert fieldsets.wants(fieldset, "films.homeworld")
+    assert not fieldsets.wants(fieldset, "homeworld.climate")
+    assert fieldsets.wants(None, "species.homeworld")
+
+
+def test_fields_on_list_route_skips_unrequested_relations(client, auth_off, mock_swapi):
+    planets = [{
+        "name": "Tatooine",
+        "climate": "arid",
+        "residents": ["https://swapi.dev/api/people/1/"],
+        "films": ["https://swapi.dev/api/films/1/"],
+        "url": "https://swapi.dev/api/planets/1/",
+    }]
+    by_url = {
+        "https://swapi.dev/api/people/1/": {"name": "Luke Skywalker", "height": "172", "mass": "77"},
+        "https://swapi.dev/api/films/1/": {"title": "A New Hope"},
+    }
+    requested = []
+
+    def fake_get(url, timeout=10):
+        requested.append(url)
+        return Resp(by_url.get(url) or {"count": 1, "results": planets, "next": None})
+
+    mock_swapi(fake_get)
+
+    res = client.get("/planets/", params={"expand": "residents,films", "fields": "name,residents.name"})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["expand"] == ["residents"]
+    assert body["results"] == [{"name": "Tatooine", "residents": [{"name": "Luke Skywalker"}]}]
+    assert "https://swapi.dev/api/films/1/" not in requested
+
+
+def test_fields_on_detail_route(client, auth_off, mock_swapi):
+    person = {"name": "Luke Skywalker", "height": "172", "species": [], "url": "https://swapi.dev/api/people/1/"}
+    mock_swapi(lambda url, timeout=10: Resp(person))
+
+    res = client.get("/peoples/1", params={"fields": "name,url"})
+    assert res.status_code == 200
+    assert res.json()["result"] == {"name": "Luke Skywalker", "url": "https://swapi.dev/api/people/1/"}
+
+
+def test_nested_homeworld_is_fetched_only_when_fields_asks(client, auth_off, mock_swapi):
+    by_url = {
+        "https://swapi.dev/api/people/1/": {
+            "name": "Luke Skywalker",
+            "homeworld": "https://swapi.dev/api/planets/1/",
+            "species": ["https://swapi.dev/api/species/1/"],
+            "url": "https://swapi.dev/api/people/1/",
+        },
+        "https://swapi.dev/api/films/1/": {
+            "title": "A New Hope",
+            "characters": ["https://swapi.dev/api/people/1/"],
+            "url": "https://swapi.dev/api/films/1/",
+        },
+        "https://swapi.dev/api/species/1/": {"name": "Human", "homeworld": "https://swapi.dev/api/planets/9/"},
+        "https://swapi.dev/api/planets/1/": {"name": "Tatooine"},
+        "https://swapi.dev/api/planets/9/": {"name": "Coruscant"},
+    }
+    requested = []
+
+    def fake_get(url, timeout=10):
+        requested.append(url)
+        return Resp(by_url[url])
+
+    mock_swapi(fake_get)
+
+    res = client.get("/peoples/1", params={"expand": "species", "fields": "species.name"})
+    assert res.json()["result"] == {"species": [{"name": "Human"}]}
+    res = client.get("/films/1", params={"expand": "characters", "fields": "characters.name"})
+    assert res.json()["result"] == {"characters": [{"name": "Luke Skywalker"}]}
+    assert "https://swapi.dev/api/planets/9/" not in requested
+    assert "https://swapi.dev/api/planets/1/" not in requested
+
+    res = client.get("/films/1", params={"expand": "characters", "fields": "characters.homeworld"})
+    assert res.json()["result"] == {"characters": [{"homeworld": "Tatooine"}]}
+    assert "https://swapi.dev/api/planets/1/" in requested
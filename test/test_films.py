@@ -1,4 +1,7 @@
-def test_films_list_q_filter(client, auth_off, monkeypatch):
+import requests
+
+
+def test_films_list_q_filter(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             status_code = 200
@@ -6,8 +9,7 @@ def test_films_list_q_filter(client, auth_off, monkeypatch):
                 return {"results": [{"title": "A New Hope"}, {"title": "The Empire Strikes Back"}]}
         return Resp()
 
-    import routers.films_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/films/?q=hope")
     assert res.status_code == 200
@@ -16,7 +18,7 @@ def test_films_list_q_filter(client, auth_off, monkeypatch):
     assert body["results"][0]["title"] == "A New Hope"
 
 
-def test_films_sort_order(client, auth_off, monkeypatch):
+def test_films_sort_order(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             status_code = 200
@@ -27,8 +29,7 @@ def test_films_sort_order(client, auth_off, monkeypatch):
                 ]}
         return Resp()
 
-    import routers.films_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/films/?sort=title&order=asc")
     assert res.status_code == 200
@@ -36,7 +37,7 @@ def test_films_sort_order(client, auth_off, monkeypatch):
     assert titles == ["A", "B"]
 
 
-def test_films_expand_characters_summary(client, auth_off, monkeypatch):
+def test_films_expand_characters_summary(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             def __init__(self, data):
@@ -63,8 +64,7 @@ def test_films_expand_characters_summary(client, auth_off, monkeypatch):
 
         return Resp({})
 
-    import routers.films_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/films/?expand=characters")
     assert res.status_code == 200
@@ -73,7 +73,7 @@ def test_films_expand_characters_summary(client, auth_off, monkeypatch):
     assert luke["homeworld"] == "Tatooine"
 
 
-def test_films_detail_by_id(client, auth_off, monkeypatch):
+def test_films_detail_by_id(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             status_code = 200
@@ -81,24 +81,60 @@ def test_films_detail_by_id(client, auth_off, monkeypatch):
                 return {"title": "A New Hope"}
         return Resp()
 
-    import routers.films_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/films/1")
     assert res.status_code == 200
     assert res.json()["result"]["title"] == "A New Hope"
 
 
-def test_films_upstream_timeout_502(client, auth_off, monkeypatch):
-    import routers.films_router as mod
-
-    class FakeReqExc(mod.requests.RequestException):
+def test_films_upstream_timeout_502(client, auth_off, mock_swapi):
+    class FakeReqExc(requests.RequestException):
         pass
 
     def fake_get(url, timeout=10):
         raise FakeReqExc("timeout")
 
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/films/")
     assert res.status_code == 502
+
+
+def test_films_expand_fetches_each_relation_once(client, auth_off, mock_swapi):
+    calls = []
+
+    def fake_get(url, timeout=10):
+        calls.append(url)
+
+        class Resp:
+            def __init__(self, data):
+                self.status_code = 200
+                self._data = data
+            def json(self):
+                return self._data
+
+        if url.endswith("/films/"):
+            return Resp({"results": [
+                {"title": "A New Hope", "characters": ["https://swapi.dev/api/people/1/", "https://swapi.dev/api/people/2/"]},
+                {"title": "The Empire Strikes Back", "characters": ["https://swapi.dev/api/people/1/"]},
+            ]})
+        if "/people/" in url:
+            return Resp({"name": "Someone", "homeworld": "https://swapi.dev/api/planets/1/"})
+        if url.endswith("/planets/1/"):
+            return Resp({"name": "Tatooine"})
+        return Resp({})
+
+    mock_swapi(fake_get)
+
+    res = client.get("/films/?expand=characters")
+    assert res.status_code == 200
+    results = res.json()["results"]
+    assert [len(f["characters"]) for f in results] == [2, 1]
+    assert results[1]["characters"][0]["homeworld"] == "Tatooine"
+    assert sorted(calls) == sorted([
+        "https://swapi.dev/api/films/",
+        "https://swapi.dev/api/people/1/",
+        "https://swapi.dev/api/people/2/",
+        "https://swapi.dev/api/planets/1/",
+    ])
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from services import filters
+from services.columns import ColumnStore
+
+PLANETS = [
+    {"name": "Tatooine", "climate": "arid", "population": "200000", "diameter": "10465", "terrain": "desert"},
+    {"name": "Alderaan", "climate": "temperate", "population": "2000000000", "diameter": "12500", "terrain": "mountains"},
+    {"name": "Geonosis", "climate": "temperate, arid", "population": "100,000,000,000", "diameter": "11370", "terrain": "rock"},
+    {"name": "Dagobah", "climate": "murky", "population": "unknown", "diameter": "8900", "terrain": "swamp"},
+]
+
+
+def _names(expr):
+    mask = filters.compile_filter(expr).mask(ColumnStore(PLANETS))
+    return [PLANETS[i]["name"] for i in np.flatnonzero(mask)]
+
+
+def test_comparisons_ranges_in_and_contains():
+    assert _names("population>1e9") == ["Alderaan", "Geonosis"]
+    assert _names("population<=200000") == ["Tatooine"]
+    assert _names("climate~ARID") == ["Tatooine", "Geonosis"]
+    assert _names("climate~murky|temperate") == ["Alderaan", "Geonosis", "Dagobah"]
+    assert _names("population>1e9;climate~arid") == ["Geonosis"]
+    assert _names("diameter=9000..12000") == ["Tatooine", "Geonosis"]
+    assert _names("terrain=desert|swamp") == ["Tatooine", "Dagobah"]
+    assert _names("climate=temperate") == ["Alderaan"]
+    assert _names("climate!=temperate") == ["Tatooine", "Geonosis", "Dagobah"]
+    assert _names("diameter==8900") == ["Dagobah"]
+
+
+def test_nulls_never_match_numeric_comparisons():
+    assert "Dagobah" not in _names("population>=0")
+    assert "Dagobah" not in _names("population<0")
+
+
+@pytest.mark.parametrize("expr", ["population>", "population>big", "nope=1", "diameter=a..b", " ; ", "population"])
+def test_invalid_expressions_are_400(expr):
+    with pytest.raises(HTTPException) as exc:
+        filters.compile_filter(expr).mask(ColumnStore(PLANETS))
+    assert exc.value.status_code == 400
+
+
+def test_expression_is_compiled_once():
+    assert filters.compile_filter("population>1e9") is filters.compile_filter("population>1e9")
+
+
+def test_filter_param_on_list_route(client, auth_off, mock_swapi):
+    class Resp:
+        status_code = 200
+
+        def json(self):
+            return {"count": len(PLANETS), "results": PLANETS, "next": None}
+
+    mock_swapi(lambda url, timeout=10: Resp())
+
+    res = client.get("/planets/", params={"filter": "population>1e9;climate~arid"})
+    assert res.status_code == 200
+    assert res.json()["filter"] == "population>1e9;climate~arid"
+    assert [p["name"] for p in res.json()["results"]] == ["Geonosis"]
+
+    res = client.get("/planets/", params={"q": "a", "filter": "diameter<12500", "sort": "population", "order": "desc"})
+    assert [p["name"] for p in res.json()["results"]] == ["Dagobah", "Tatooine"]
+
+    assert client.get("/planets/", params={"filter": "nope>1"}).status_code == 400
@@ -0,0 +1,61 @@
+import time
+
+from conftest import Resp
+from services import cache, known_ids, mirror
+
+
+def test_upstream_404_is_negatively_cached(client, auth_off, mock_swapi, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    calls = []
+
+    def fake_get(url, timeout=10):
+        calls.append(url)
+        return Resp({"detail": "Not found"}, status_code=404)
+
+    mock_swapi(fake_get)
+
+    assert client.get("/peoples/9999").status_code == 404
+    assert client.get("/peoples/9999").status_code == 404
+    assert len(calls) == 1
+
+    now[0] += cache.CACHE_NEGATIVE_TTL_SECONDS
+    assert client.get("/peoples/9999").status_code == 404
+    assert len(calls) == 2
+
+
+def test_full_crawl_lets_by_id_reject_unknown_ids_without_io(client, auth_off, mock_swapi):
+    calls = []
+    planets = [
+        {"name": "Tatooine", "url": "https://swapi.dev/api/planets/1/", "residents": [], "films": []},
+        {"name": "Alderaan", "url": "https://swapi.dev/api/planets/2/", "residents": [], "films": []},
+    ]
+
+    def fake_get(url, timeout=10):
+        calls.append(url)
+        return Resp({"count": 2, "results": planets, "next": None})
+
+    mock_swapi(fake_get)
+
+    assert client.get("/planets/?sort=name").status_code == 200
+    calls.clear()
+
+    assert client.get("/planets/0").status_code == 404
+    assert client.get("/planets/99").status_code == 404
+    assert client.get("/planets/2").json()["result"]["name"] == "Alderaan"
+    assert calls == []
+
+
+def test_search_results_do_not_count_as_full_crawl():
+    known_ids.record_crawl("planets", [{"url": "https://swapi.dev/api/planets/1/"}], total=60)
+    known_ids.ensure_known("planets", 42)
+
+
+def test_mirror_load_records_known_ids(client, auth_off, mock_swapi):
+    calls = []
+    mock_swapi(lambda url, timeout=10: calls.append(url))
+    mirror.load({r: [{"url": f"https://swapi.dev/api/{r}/1/", "name": "x"}] for r in mirror.RESOURCES}, 1)
+
+    assert client.get("/peoples/2").status_code == 404
+    assert client.get("/films/7").status_code == 404
+    assert calls == []
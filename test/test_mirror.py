@@ -0,0 +1,101 @@
+import asyncio
+
+from conftest import Resp
+from services import mirror
+
+
+def _fake_swapi(calls, sizes):
+    """SWAPI paginada (10 por página) com `sizes[resource]` itens por recurso."""
+    def fake_get(url, timeout=10):
+        calls.append(url)
+        resource = url.split("/api/", 1)[1].split("/", 1)[0]
+        page = int(url.rsplit("page=", 1)[1]) if "page=" in url else 1
+        total = sizes.get(resource, 0)
+        start = (page - 1) * 10
+        results = []
+        for i in range(start + 1, min(start + 10, total) + 1):
+            item = {"url": f"https://swapi.dev/api/{resource}/{i}/", "name": f"{resource}-{i:03d}", "title": f"{resource}-{i}"}
+            if resource == "people":
+                item.update({"homeworld": "https://swapi.dev/api/planets/1/", "species": [], "films": []})
+            results.append(item)
+        has_next = start + 10 < total
+        return Resp({"count": total, "results": results, "next": f"{url}?page={page + 1}" if has_next else None})
+
+    return fake_get
+
+
+def test_refresh_crawls_every_collection_without_page_cap(mock_swapi):
+    calls = []
+    mock_swapi(_fake_swapi(calls, {"people": 120, "films": 6, "planets": 60, "species": 37, "starships": 36, "vehicles": 39}))
+
+    asyncio.run(mirror.refresh())
+
+    assert len(mirror.get("people").items) == 120
+    assert len(mirror.get("films").items) == 6
+    assert mirror.version() == 1
+    assert mirror.lookup("https://swapi.dev/api/planets/60/")["name"] == "planets-060"
+
+
+def test_routes_are_served_from_mirror_without_upstream_calls(client, auth_off, mock_swapi):
+    calls = []
+    mock_swapi(_fake_swapi(calls, {"people": 120, "films": 6, "planets": 60, "species": 37, "starships": 36, "vehicles": 39}))
+    asyncio.run(mirror.refresh())
+    calls.clear()
+
+    res = client.get("/peoples/?sort=name&order=desc&page=1&limit=5&expand=homeworld")
+    assert res.status_code == 200
+    body = res.json()
+    assert body["count"] == 120
+    assert body["results"][0]["name"] == "people-120"
+    assert body["results"][0]["homeworld"]["name"] == "planets-001"
+
+    assert client.get("/planets/?q=planets-05").json()["count"] == 10
+    assert client.get("/starships/7").json()["result"]["name"] == "starships-007"
+    assert client.get("/search?resource=vehicles&q=vehicles-03").json()["count"] == 10
+    assert calls == []
+
+
+def test_collection_sort_orders_match_sorted_and_are_precomputed():
+    def key(v):
+        return (v is None, str(v).lower() if v is not None else "")
+
+    items = [{"name": n, "mass": m} for n, m in [("b", "10"), ("A", None), ("c", "10"), ("a", "7")]]
+    mirror.register_sort_keys("test-sort", {"name", "mass"}, key)
+    collection = mirror.Collection("test-sort", items, 1)
+
+    # registradas: já calculadas na ingestão (asc e desc de cada campo)
+    assert len(collection._orders) == 4
+    for field in ("name", "mass"):
+        for reverse in (False, True):
+            expected = sorted(items, key=lambda it: key(it.get(field)), reverse=reverse)
+            assert list(collection.ordered(field, key, reverse)) == expected
+    assert collection.ordered("mass", key)[1:3] == [items[2], items[3]]
+
+
+def test_sorted_pages_come_from_the_precomputed_order(client, auth_off, mock_swapi):
+    calls = []
+    mock_swapi(_fake_swapi(calls, {"people": 25, "films": 0, "planets": 0, "species": 0, "starships": 0, "vehicles": 0}))
+    asyncio.run(mirror.refresh())
+    calls.clear()
+
+    collection = mirror.get("people")
+    res = client.get("/peoples/?sort=name&order=desc&page=2&limit=5")
+    assert [p["name"] for p in res.json()["results"]] == [f"people-{i:03d}" for i in range(20, 15, -1)]
+    assert res.json()["count"] == 25
+    assert mirror.get("people") is collection
+    assert calls == []
+
+
+def test_unknown_sort_fields_are_not_memoized(client, auth_off):
+    mirror.load({"people": [{"name": "Luke", "height": "172"}, {"name": "Leia", "height": "150"}]}, 1)
+    collection = mirror.get("people")
+    baseline = len(collection._orders), len(collection._ranks)
+
+    for i in range(50):
+        res = client.get(f"/search?resource=people&sort=f{i}")
+        assert res.status_code == 200
+    assert (len(collection._orders), len(collection._ranks)) == baseline
+
+    # campo que existe nos itens continua guardado depois da primeira vez
+    client.get("/search?resource=people&sort=height")
+    assert len(collection._orders) == baseline[0] + 1
@@ -0,0 +1,115 @@
+import copy
+
+import pytest
+
+from conftest import Resp
+from services import dataset, mirror, topk
+
+
+def _people(n, prefix="Person"):
+    return [
+        {"name": f"{prefix} {i % 9}", "height": str(100 + i), "species": [],
+         "url": f"https://swapi.dev/api/people/{i}/"}
+        for i in range(n)
+    ]
+
+
+def _walk(client, path, params):
+    urls, cursor = [], None
+    while True:
+        body = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        urls.extend(p["url"] for p in body["results"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return urls
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_cursor_walk_matches_sorted_order_with_ties(client, auth_off, mock_swapi, monkeypatch, order):
+    people = _people(50)
+    mock_swapi(lambda url, timeout=10: Resp({"count": len(people), "results": people, "next": None}))
+
+    remaining = [p for p in people if p["height"] != "101"]
+    # sorted() é estável também com reverse=True: empates ficam na ordem original
+    expected = [p["url"] for p in sorted(remaining, key=lambda p: p["name"].lower(), reverse=order == "desc")]
+
+    params = {"filter": "height!=101", "sort": "name", "order": order, "limit": 7}
+    first = client.get("/peoples/", params=params).json()
+    # depois da primeira página, o keyset não reordena o prefixo já entregue
+    monkeypatch.setattr(topk, "sorted_prefix", lambda *a: pytest.fail("prefix re-sorted"))
+    urls = [p["url"] for p in first["results"]] + _walk(client, "/peoples/", {**params, "cursor": first["next_cursor"]})
+    assert urls == expected
+
+
+def test_cursor_stays_on_its_dataset_version(client, auth_off):
+    mirror.load({"people": _people(6)}, 1)
+    first = client.get("/peoples/", params={"limit": 4}).json()
+    assert [p["name"] for p in first["results"]] == ["Person 0", "Person 1", "Person 2", "Person 3"]
+
+    mirror.load({"people": _people(6, "Other")}, 2)
+    second = client.get("/peoples/", params={"limit": 4, "cursor": first["next_cursor"]}).json()
+    assert [p["name"] for p in second["results"]] == ["Person 4", "Person 5"]
+    assert second["next_cursor"] is None
+
+    # a versão nova vira a atual e a antiga continua guardada até sair da janela
+    assert client.get("/peoples/", params={"limit": 4}).json()["results"][0]["name"] == "Other 0"
+    for version in range(3, 3 + dataset.RETAINED_VERSIONS):
+        mirror.load({"people": _people(6)}, version)
+        client.get("/peoples/", params={"limit": 4})
+    assert client.get("/peoples/", params={"limit": 4, "cursor": first["next_cursor"]}).status_code == 410
+
+
+def test_upstream_pages_hand_over_to_a_cursor(client, auth_off, mock_swapi):
+    people = _people(25)
+    mock_swapi(lambda url, timeout=10: Resp({"count": len(people), "results": people, "next": None}))
+
+    assert _walk(client, "/search", {"resource": "people", "limit": 10}) == [p["url"] for p in people]
+
+
+def test_invalid_or_foreign_cursor_is_400(client, auth_off):
+    mirror.load({"people": _people(6)}, 1)
+    cursor = client.get("/peoples/", params={"limit": 2, "sort": "name"}).json()["next_cursor"]
+
+    assert client.get("/peoples/", params={"limit": 2, "sort": "name", "cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/peoples/", params={"limit": 2, "sort": "height", "cursor": cursor}).status_code == 400
+    assert client.get("/peoples/", params={"limit": 2, "sort": "name", "cursor": cursor}).status_code == 200
+
+
+def test_local_and_mirror_collections_never_share_a_version(client, auth_off, mock_swapi):
+    # espelho fora do ar no início: as páginas saem de uma coleção local montada do upstream
+    people = _people(6)
+    mock_swapi(lambda url, timeout=10: Resp({"count": len(people), "results": people, "next": None}))
+    first = client.get("/peoples/", params={"limit": 4, "sort": "name"}).json()
+
+    # o espelho sobe depois, com outro conteúdo
+    mirror.load({"people": _people(6, "Other")}, mirror.next_version())
+
+    second = client.get("/peoples/", params={"limit": 4, "sort": "name", "cursor": first["next_cursor"]}).json()
+    urls = [p["url"] for p in first["results"] + second["results"]]
+    assert sorted(urls) == sorted(p["url"] for p in people)
+    assert all(p["name"].startswith("Person") for p in second["results"])
+
+
+def test_refreshed_pages_with_same_content_keep_the_version(client, auth_off, mock_swapi):
+    from services import cache
+
+    people = _people(6)
+    # cada busca no upstream devolve objetos novos, como uma revalidação de verdade
+    mock_swapi(lambda url, timeout=10: Resp({"count": len(people), "results": copy.deepcopy(people), "next": None}))
+    first = client.get("/peoples/", params={"limit": 4, "sort": "name"}).json()
+    version = dataset._LOCAL["people"].version
+
+    for _ in range(dataset.RETAINED_VERSIONS + 1):
+        cache.clear()
+        client.get("/peoples/", params={"limit": 4, "sort": "name"})
+    assert dataset._LOCAL["people"].version == version
+
+    second = client.get("/peoples/", params={"limit": 4, "sort": "name", "cursor": first["next_cursor"]})
+    assert second.status_code == 200
+    assert len(second.json()["results"]) == 2
+
+    # conteúdo alterado de fato gera versão nova
+    people[0] = {**people[0], "name": "Renamed"}
+    cache.clear()
+    client.get("/peoples/", params={"limit": 4, "sort": "name"})
+    assert dataset._LOCAL["people"].version != version
@@ -1,4 +1,9 @@
-def test_people_list_q_filter(client, auth_off, monkeypatch):
+import requests
+
+from conftest import Resp
+
+
+def test_people_list_q_filter(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             def __init__(self, data):
@@ -13,8 +18,7 @@ def test_people_list_q_filter(client, auth_off, monkeypatch):
             return Resp({"results": [{"name": "Luke Skywalker"}, {"name": "Leia Organa"}], "next": None})
         return Resp({})
 
-    import routers.people_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/peoples/?q=luke")
     assert res.status_code == 200
@@ -23,7 +27,7 @@ def test_people_list_q_filter(client, auth_off, monkeypatch):
     assert body["results"][0]["name"] == "Luke Skywalker"
 
 
-def test_people_sort_order(client, auth_off, monkeypatch):
+def test_people_sort_order(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             status_code = 200
@@ -31,8 +35,7 @@ def test_people_sort_order(client, auth_off, monkeypatch):
                 return {"results": [{"name": "B"}, {"name": "A"}], "next": None}
         return Resp()
 
-    import routers.people_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/peoples/?sort=name&order=asc")
     assert res.status_code == 200
@@ -40,7 +43,29 @@ def test_people_sort_order(client, auth_off, monkeypatch):
     assert names == ["A", "B"]
 
 
-def test_people_expand_homeworld_films(client, auth_off, monkeypatch):
+def test_people_sort_height_and_mass_numerically(client, auth_off, mock_swapi):
+    people = [
+        {"name": "Luke", "height": "172", "mass": "77", "species": []},
+        {"name": "Jabba", "height": "175", "mass": "1,358", "species": []},
+        {"name": "Yoda", "height": "66", "mass": "17", "species": []},
+        {"name": "R2-D2", "height": "102", "mass": "32", "species": []},
+        {"name": "Wicket", "height": "57", "mass": "20", "species": []},
+        {"name": "Arvel", "height": "unknown", "mass": "unknown", "species": []},
+    ]
+    mock_swapi(lambda url, timeout=10: Resp({"count": len(people), "results": people, "next": None}))
+
+    res = client.get("/peoples/?sort=height")
+    assert [x["height"] for x in res.json()["results"]] == ["57", "66", "102", "172", "175", "unknown"]
+
+    res = client.get("/peoples/?sort=mass&order=desc")
+    assert [x["name"] for x in res.json()["results"]] == ["Arvel", "Jabba", "Luke", "R2-D2", "Wicket", "Yoda"]
+
+    # subconjunto filtrado usa o mesmo posto numérico
+    res = client.get("/peoples/?q=a&sort=height")
+    assert [x["name"] for x in res.json()["results"]] == ["Yoda", "Jabba", "Arvel"]
+
+
+def test_people_expand_homeworld_films(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             def __init__(self, data):
@@ -70,8 +95,7 @@ def test_people_expand_homeworld_films(client, auth_off, monkeypatch):
 
         return Resp({})
 
-    import routers.people_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/peoples/1?expand=homeworld,films")
     assert res.status_code == 200
@@ -80,7 +104,7 @@ def test_people_expand_homeworld_films(client, auth_off, monkeypatch):
     assert result["films"][0]["title"] == "A New Hope"
 
 
-def test_people_detail_by_id(client, auth_off, monkeypatch):
+def test_people_detail_by_id(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             status_code = 200
@@ -88,24 +112,49 @@ def test_people_detail_by_id(client, auth_off, monkeypatch):
                 return {"name": "Luke Skywalker", "species": []}
         return Resp()
 
-    import routers.people_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/peoples/1")
     assert res.status_code == 200
     assert res.json()["result"]["name"] == "Luke Skywalker"
 
 
-def test_people_upstream_timeout_502(client, auth_off, monkeypatch):
-    import routers.people_router as mod
-
-    class FakeReqExc(mod.requests.RequestException):
+def test_people_upstream_timeout_502(client, auth_off, mock_swapi):
+    class FakeReqExc(requests.RequestException):
         pass
 
     def fake_get(url, timeout=10):
         raise FakeReqExc("timeout")
 
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/peoples/")
     assert res.status_code == 502
+
+
+def test_people_list_fetches_only_needed_upstream_pages(client, auth_off, mock_swapi):
+    calls = []
+
+    def fake_get(url, timeout=10):
+        calls.append(url)
+
+        class Resp:
+            status_code = 200
+            def json(self):
+                page = int(url.rsplit("page=", 1)[1]) if "page=" in url else 1
+                start = (page - 1) * 10
+                return {
+                    "count": 82,
+                    "results": [{"name": f"P{i}", "species": ["s"]} for i in range(start, min(start + 10, 82))],
+                    "next": None if start + 10 >= 82 else f"https://swapi.dev/api/people/?page={page + 1}",
+                }
+        return Resp()
+
+    mock_swapi(fake_get)
+
+    res = client.get("/peoples/?page=5&limit=10")
+    assert res.status_code == 200
+    body = res.json()
+    assert body["count"] == 82
+    assert [x["name"] for x in body["results"]] == [f"P{i}" for i in range(40, 50)]
+    assert calls == ["https://swapi.dev/api/people/", "https://swapi.dev/api/people/?page=5"]
@@ -1,4 +1,7 @@
-def test_planets_list_q_filter(client, auth_off, monkeypatch):
+import requests
+
+
+def test_planets_list_q_filter(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             def __init__(self, data):
@@ -11,8 +14,7 @@ def test_planets_list_q_filter(client, auth_off, monkeypatch):
             return Resp({"results": [{"name": "Tatooine"}, {"name": "Alderaan"}], "next": None})
         return Resp({})
 
-    import routers.planets_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/planets/?q=tat")
     assert res.status_code == 200
@@ -20,7 +22,7 @@ def test_planets_list_q_filter(client, auth_off, monkeypatch):
     assert res.json()["results"][0]["name"] == "Tatooine"
 
 
-def test_planets_sort_order(client, auth_off, monkeypatch):
+def test_planets_sort_order(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             status_code = 200
@@ -28,15 +30,14 @@ def test_planets_sort_order(client, auth_off, monkeypatch):
                 return {"results": [{"name": "B"}, {"name": "A"}], "next": None}
         return Resp()
 
-    import routers.planets_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/planets/?sort=name&order=asc")
     assert res.status_code == 200
     assert [x["name"] for x in res.json()["results"]] == ["A", "B"]
 
 
-def test_planets_expand_residents_films(client, auth_off, monkeypatch):
+def test_planets_expand_residents_films(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             def __init__(self, data):
@@ -68,8 +69,7 @@ def test_planets_expand_residents_films(client, auth_off, monkeypatch):
 
         return Resp({})
 
-    import routers.planets_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/planets/1?expand=residents,films")
     assert res.status_code == 200
@@ -78,15 +78,13 @@ def test_planets_expand_residents_films(client, auth_off, monkeypatch):
     assert result["films"][0]["title"] == "A New Hope"
 
 
-def test_planets_upstream_timeout_502(client, auth_off, monkeypatch):
-    import routers.planets_router as mod
-
-    class FakeReqExc(mod.requests.RequestException):
+def test_planets_upstream_timeout_502(client, auth_off, mock_swapi):
+    class FakeReqExc(requests.RequestException):
         pass
 
     def fake_get(url, timeout=10):
         raise FakeReqExc("timeout")
 
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
     res = client.get("/planets/")
     assert res.status_code == 502
@@ -0,0 +1,27 @@
+def test_search_q_sort_and_expand(client, auth_off, mock_swapi):
+    def fake_get(url, timeout=10):
+        class Resp:
+            def __init__(self, data):
+                self.status_code = 200
+                self._data = data
+            def json(self):
+                return self._data
+
+        if url.endswith("/people/"):
+            return Resp({"results": [
+                {"name": "Luke Skywalker", "homeworld": "https://swapi.dev/api/planets/1/"},
+                {"name": "Leia Organa", "homeworld": "https://swapi.dev/api/planets/2/"},
+                {"name": "Anakin Skywalker", "homeworld": "https://swapi.dev/api/planets/1/"},
+            ], "next": None})
+        if url.endswith("/planets/1/"):
+            return Resp({"name": "Tatooine"})
+        return Resp({})
+
+    mock_swapi(fake_get)
+
+    res = client.get("/search?resource=people&q=skywalker&sort=name&expand=homeworld")
+    assert res.status_code == 200
+    body = res.json()
+    assert body["count"] == 2
+    assert [x["name"] for x in body["results"]] == ["Anakin Skywalker", "Luke Skywalker"]
+    assert body["results"][0]["homeworld"]["name"] == "Tatooine"
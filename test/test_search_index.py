@@ -0,0 +1,88 @@
+import asyncio
+
+from conftest import Resp
+from services import dataset
+from services.search_index import NgramIndex, bounded_levenshtein
+
+
+NAMES = ["Luke Skywalker", "Leia Organa", "Anakin Skywalker", "R2-D2", None]
+
+
+def test_ngram_index_substring_search():
+    index = NgramIndex(NAMES)
+
+    assert index.search("skywalker") == [0, 2]
+    assert index.search("SKY") == [0, 2]
+    assert index.search("o") == [1]
+    assert index.search("r2-d") == [3]
+    # todos os trigramas existem, mas não em sequência
+    assert index.search("walkerluke") == []
+    assert index.search("  ") == [0, 1, 2, 3, 4]
+
+
+def test_ngram_index_matches_plain_scan():
+    index = NgramIndex(NAMES)
+    for q in ["l", "ke", "an", "walk", "organa", "d2", "xyz", "e s"]:
+        expected = [i for i, n in enumerate(NAMES) if q in str(n or "").lower()]
+        assert index.search(q) == expected
+
+
+def test_q_is_answered_locally_without_upstream_search(client, auth_off, mock_swapi):
+    calls = []
+    people = [
+        {"name": "Luke Skywalker", "url": "https://swapi.dev/api/people/1/", "species": []},
+        {"name": "Leia Organa", "url": "https://swapi.dev/api/people/5/", "species": []},
+    ]
+
+    def fake_get(url, timeout=10):
+        calls.append(url)
+        return Resp({"count": 2, "results": people, "next": None})
+
+    mock_swapi(fake_get)
+
+    assert client.get("/peoples/?q=luke").json()["count"] == 1
+    assert client.get("/peoples/?q=org").json()["results"][0]["name"] == "Leia Organa"
+    assert client.get("/search?resource=people&q=a").json()["count"] == 2
+    assert calls == ["https://swapi.dev/api/people/"]
+
+
+def test_local_collection_is_indexed_once_per_upstream_version(mock_swapi):
+    mock_swapi(lambda url, timeout=10: Resp({"count": 1, "results": [{"name": "Tatooine"}], "next": None}))
+
+    first = asyncio.run(dataset.aget("planets"))
+    second = asyncio.run(dataset.aget("planets"))
+    assert first is second
+
+
+def test_bounded_levenshtein_stops_past_limit():
+    assert bounded_levenshtein("skywaker", "skywalker", 2) == 1
+    assert bounded_levenshtein("kitten", "sitting", 3) == 3
+    assert bounded_levenshtein("kitten", "sitting", 2) is None
+    assert bounded_levenshtein("luke", "lukeskywalker", 2) is None
+
+
+def test_fuzzy_ranks_typos_by_score():
+    index = NgramIndex(["Luke Skywalker", "Millennium Falcon", "Anakin Skywalker", "Leia Organa"])
+
+    assert index.fuzzy("millenium falcon") == [(1, 0.933)]
+    assert [i for i, _ in index.fuzzy("skywaker")] == [0, 2]
+    assert [i for i, _ in index.fuzzy("luke skywaker")] == [0]
+    assert index.fuzzy("luke")[0] == (0, 1.0)
+    assert index.fuzzy("zzzz") == []
+
+
+def test_fuzzy_mode_on_list_routes_and_search(client, auth_off, mock_swapi):
+    starships = [
+        {"name": "X-wing", "url": "https://swapi.dev/api/starships/12/"},
+        {"name": "Millennium Falcon", "url": "https://swapi.dev/api/starships/10/"},
+    ]
+    mock_swapi(lambda url, timeout=10: Resp({"count": 2, "results": starships, "next": None}))
+
+    assert client.get("/starships/?q=millenium").json()["count"] == 0
+
+    body = client.get("/starships/?q=millenium falcon&fuzzy=true").json()
+    assert body["fuzzy"] is True
+    assert [s["name"] for s in body["results"]] == ["Millennium Falcon"]
+
+    body = client.get("/search?resource=starships&q=xwing&fuzzy=true").json()
+    assert [s["name"] for s in body["results"]] == ["X-wing"]
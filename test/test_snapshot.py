@@ -0,0 +1,70 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from services import cache, mirror, snapshot
+
+
+def _collections():
+    return {r: [{"url": f"https://swapi.dev/api/{r}/1/", "name": f"{r}-1"}] for r in mirror.RESOURCES}
+
+
+def test_snapshot_round_trip_restores_mirror_and_cache(tmp_path):
+    path = str(tmp_path / "swapi.db")
+    mirror.load(_collections(), 3)
+    cache.put("https://swapi.dev/api/people/?search=luke", {"results": [{"name": "Luke"}]}, ttl=60)
+    snapshot.save(path)
+
+    mirror.clear()
+    cache.clear()
+
+    assert snapshot.load(path, restore_mirror=True) is True
+    assert mirror.version() == 3
+    assert mirror.lookup("https://swapi.dev/api/planets/1/")["name"] == "planets-1"
+    assert cache.get("https://swapi.dev/api/people/?search=luke") == {"results": [{"name": "Luke"}]}
+
+
+def test_snapshot_skips_mirror_when_mirror_mode_is_off(tmp_path):
+    path = str(tmp_path / "swapi.db")
+    mirror.load(_collections(), 1)
+    snapshot.save(path)
+    mirror.clear()
+
+    assert snapshot.load(path, restore_mirror=False) is False
+    assert mirror.get("people") is None
+
+
+def test_snapshot_ignores_other_format_version_and_old_files(tmp_path, monkeypatch):
+    path = str(tmp_path / "swapi.db")
+    mirror.load(_collections(), 1)
+    snapshot.save(path)
+    mirror.clear()
+
+    current = snapshot.SNAPSHOT_FORMAT_VERSION
+    monkeypatch.setattr(snapshot, "SNAPSHOT_FORMAT_VERSION", current + 1)
+    assert snapshot.load(path, restore_mirror=True) is False
+
+    monkeypatch.setattr(snapshot, "SNAPSHOT_FORMAT_VERSION", current)
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE meta SET value = '0' WHERE key = 'saved_at'")
+    conn.commit()
+    conn.close()
+    assert snapshot.load(path, restore_mirror=True) is False
+    assert mirror.get("people") is None
+
+
+def test_snapshot_missing_file_is_a_cold_start(tmp_path):
+    assert snapshot.load(str(tmp_path / "missing.db"), restore_mirror=True) is False
+
+
+def test_concurrent_saves_do_not_clobber_each_other(tmp_path):
+    cache.put("https://swapi.dev/api/people/1/", {"name": "Luke Skywalker"}, ttl=60)
+    path = str(tmp_path / "swapi.db")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda _: snapshot.save(path), range(8)))
+
+    cache.clear()
+    snapshot.load(path, restore_mirror=False)
+    assert cache.get("https://swapi.dev/api/people/1/") == {"name": "Luke Skywalker"}
+    assert not os.path.exists(f"{path}.tmp")
@@ -1,4 +1,7 @@
-def test_species_list_q_filter(client, auth_off, monkeypatch):
+import requests
+
+
+def test_species_list_q_filter(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             def __init__(self, data):
@@ -11,8 +14,7 @@ def test_species_list_q_filter(client, auth_off, monkeypatch):
             return Resp({"results": [{"name": "Human"}, {"name": "Droid"}], "next": None})
         return Resp({})
 
-    import routers.species_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/species/?q=dro")
     assert res.status_code == 200
@@ -20,7 +22,7 @@ def test_species_list_q_filter(client, auth_off, monkeypatch):
     assert res.json()["results"][0]["name"] == "Droid"
 
 
-def test_species_expand_people_films(client, auth_off, monkeypatch):
+def test_species_expand_people_films(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             def __init__(self, data):
@@ -54,8 +56,7 @@ def test_species_expand_people_films(client, auth_off, monkeypatch):
 
         return Resp({})
 
-    import routers.species_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/species/1?expand=people,films")
     assert res.status_code == 200
@@ -64,15 +65,13 @@ def test_species_expand_people_films(client, auth_off, monkeypatch):
     assert result["films"][0]["title"] == "A New Hope"
 
 
-def test_species_upstream_timeout_502(client, auth_off, monkeypatch):
-    import routers.species_router as mod
-
-    class FakeReqExc(mod.requests.RequestException):
+def test_species_upstream_timeout_502(client, auth_off, mock_swapi):
+    class FakeReqExc(requests.RequestException):
         pass
 
     def fake_get(url, timeout=10):
         raise FakeReqExc("timeout")
 
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
     res = client.get("/species/")
     assert res.status_code == 502
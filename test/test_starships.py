@@ -1,4 +1,7 @@
-def test_starships_list_q_filter(client, auth_off, monkeypatch):
+import requests
+
+
+def test_starships_list_q_filter(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             def __init__(self, data):
@@ -11,8 +14,7 @@ def test_starships_list_q_filter(client, auth_off, monkeypatch):
             return Resp({"results": [{"name": "X-wing"}, {"name": "TIE Fighter"}], "next": None})
         return Resp({})
 
-    import routers.starships_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/starships/?q=x")
     assert res.status_code == 200
@@ -20,7 +22,7 @@ def test_starships_list_q_filter(client, auth_off, monkeypatch):
     assert res.json()["results"][0]["name"] == "X-wing"
 
 
-def test_starships_expand_pilots_films(client, auth_off, monkeypatch):
+def test_starships_expand_pilots_films(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             def __init__(self, data):
@@ -55,8 +57,7 @@ def test_starships_expand_pilots_films(client, auth_off, monkeypatch):
 
         return Resp({})
 
-    import routers.starships_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/starships/9?expand=pilots,films")
     assert res.status_code == 200
@@ -65,15 +66,13 @@ def test_starships_expand_pilots_films(client, auth_off, monkeypatch):
     assert result["films"][0]["title"] == "A New Hope"
 
 
-def test_starships_upstream_timeout_502(client, auth_off, monkeypatch):
-    import routers.starships_router as mod
-
-    class FakeReqExc(mod.requests.RequestException):
+def test_starships_upstream_timeout_502(client, auth_off, mock_swapi):
+    class FakeReqExc(requests.RequestException):
         pass
 
     def fake_get(url, timeout=10):
         raise FakeReqExc("timeout")
 
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
     res = client.get("/starships/")
     assert res.status_code == 502
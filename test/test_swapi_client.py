@@ -0,0 +1,236 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+from fastapi import HTTPException
+
+from conftest import Resp
+from services import swapi_client
+
+
+def test_session_uses_keepalive_pool_with_configured_limits():
+    adapter = swapi_client.session.get_adapter(f"{swapi_client.SWAPI_BASE_URL}/people/")
+    assert adapter._pool_connections == swapi_client.SWAPI_POOL_CONNECTIONS
+    assert adapter._pool_maxsize == swapi_client.SWAPI_POOL_MAXSIZE
+    assert adapter._pool_block == swapi_client.SWAPI_POOL_BLOCK
+
+
+def test_get_json_uses_shared_session_and_configured_timeouts(mock_swapi):
+    calls = []
+
+    def fake_get(url, timeout=10):
+        calls.append((url, timeout))
+        return Resp({"name": "Luke Skywalker"})
+
+    mock_swapi(fake_get)
+
+    assert swapi_client.get_json("https://swapi.dev/api/people/1/") == {"name": "Luke Skywalker"}
+    assert calls == [(
+        "https://swapi.dev/api/people/1/",
+        (swapi_client.SWAPI_CONNECT_TIMEOUT, swapi_client.SWAPI_READ_TIMEOUT),
+    )]
+
+
+@pytest.mark.parametrize("status_code, expected", [(404, 404), (500, 502), (429, 502)])
+def test_get_json_maps_upstream_errors(mock_swapi, status_code, expected):
+    mock_swapi(lambda url, timeout=10: Resp(None, status_code))
+
+    with pytest.raises(HTTPException) as exc:
+        swapi_client.get_json("https://swapi.dev/api/people/1/")
+    assert exc.value.status_code == expected
+
+
+def test_get_json_request_exception_is_502(mock_swapi):
+    def fake_get(url, timeout=10):
+        raise requests.ConnectionError("boom")
+
+    mock_swapi(fake_get)
+
+    with pytest.raises(HTTPException) as exc:
+        swapi_client.get_json("https://swapi.dev/api/people/1/")
+    assert exc.value.status_code == 502
+
+
+def test_aget_json_uses_async_client(mock_swapi):
+    mock_swapi(lambda url, timeout=10: Resp({"title": "A New Hope"}))
+
+    assert asyncio.run(swapi_client.aget_json("https://swapi.dev/api/films/1/")) == {"title": "A New Hope"}
+
+
+@pytest.mark.parametrize("status_code, expected", [(404, 404), (503, 502)])
+def test_aget_json_maps_upstream_errors(mock_swapi, status_code, expected):
+    mock_swapi(lambda url, timeout=10: Resp(None, status_code))
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(swapi_client.aget_json("https://swapi.dev/api/films/1/"))
+    assert exc.value.status_code == expected
+
+
+def test_gather_limited_caps_concurrency_and_keeps_order():
+    running = 0
+    peak = 0
+
+    async def work(i):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return i
+
+    result = asyncio.run(swapi_client.gather_limited((work(i) for i in range(10)), limit=3))
+    assert result == list(range(10))
+    assert peak == 3
+
+
+def test_map_limited_keeps_order():
+    assert swapi_client.map_limited(lambda x: x * 2, [3, 1, 2]) == [6, 2, 4]
+
+
+def test_get_json_coalesces_concurrent_calls_for_same_url(mock_swapi):
+    calls = []
+    barrier = threading.Barrier(5)
+
+    def fake_get(url, timeout=10):
+        calls.append(url)
+        time.sleep(0.05)
+        return Resp({"name": "Tatooine"})
+
+    mock_swapi(fake_get)
+
+    def worker(_):
+        barrier.wait()
+        return swapi_client.get_json("https://swapi.dev/api/planets/1/")
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(worker, range(5)))
+
+    assert results == [{"name": "Tatooine"}] * 5
+    assert calls == ["https://swapi.dev/api/planets/1/"]
+
+
+def test_aget_json_coalesces_and_shares_errors(mock_swapi):
+    calls = []
+
+    def fake_get(url, timeout=10):
+        calls.append(url)
+        return Resp(None, 404)
+
+    mock_swapi(fake_get)
+
+    async def run():
+        return await asyncio.gather(
+            *(swapi_client.aget_json("https://swapi.dev/api/people/9999/") for _ in range(5)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, HTTPException) and r.status_code == 404 for r in results)
+    assert calls == ["https://swapi.dev/api/people/9999/"]
+    assert swapi_client._ainflight == {}
+
+
+def _paged_fetch(total, page_size=10):
+    calls = []
+
+    async def fetch(url):
+        calls.append(url)
+        page = int(url.rsplit("page=", 1)[1]) if "page=" in url else 1
+        start = (page - 1) * page_size
+        results = [{"name": f"item-{i}"} for i in range(start, min(start + page_size, total))]
+        has_next = start + page_size < total
+        return {"count": total, "results": results, "next": f"next-{page + 1}" if has_next else None}
+
+    return fetch, calls
+
+
+def test_acollect_fetches_only_pages_covering_the_slice():
+    fetch, calls = _paged_fetch(82)
+
+    items, total = asyncio.run(swapi_client.acollect("https://swapi.dev/api/people/", fetch, 45, 55))
+
+    assert total == 82
+    assert [x["name"] for x in items] == [f"item-{i}" for i in range(45, 55)]
+    assert calls == [
+        "https://swapi.dev/api/people/",
+        "https://swapi.dev/api/people/?page=5",
+        "https://swapi.dev/api/people/?page=6",
+    ]
+
+
+def test_acollect_whole_collection_uses_count_and_keeps_search_param():
+    fetch, calls = _paged_fetch(25)
+
+    items, total = asyncio.run(swapi_client.acollect("https://swapi.dev/api/people/?search=a", fetch))
+
+    assert total == 25
+    assert len(items) == 25
+    assert sorted(calls[1:]) == [
+        "https://swapi.dev/api/people/?search=a&page=2",
+        "https://swapi.dev/api/people/?search=a&page=3",
+    ]
+
+
+def test_get_json_retries_transient_failures(mock_swapi):
+    calls = []
+
+    def fake_get(url, timeout=10):
+        calls.append(url)
+        if len(calls) == 1:
+            raise requests.ConnectionError("boom")
+        if len(calls) == 2:
+            return Resp(None, 503)
+        return Resp({"name": "Luke Skywalker"})
+
+    mock_swapi(fake_get)
+
+    assert swapi_client.get_json("https://swapi.dev/api/people/1/") == {"name": "Luke Skywalker"}
+    assert len(calls) == 3
+
+
+def test_get_json_does_not_retry_4xx(mock_swapi):
+    calls = []
+
+    def fake_get(url, timeout=10):
+        calls.append(url)
+        return Resp(None, 404)
+
+    mock_swapi(fake_get)
+
+    with pytest.raises(HTTPException):
+        swapi_client.get_json("https://swapi.dev/api/people/999/")
+    assert len(calls) == 1
+
+
+def test_circuit_opens_fails_fast_and_recovers(mock_swapi, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(swapi_client.time, "time", lambda: now[0])
+    calls = []
+    healthy = [False]
+
+    def fake_get(url, timeout=10):
+        calls.append(url)
+        return Resp({"name": "Luke Skywalker"}) if healthy[0] else Resp(None, 500)
+
+    mock_swapi(fake_get)
+    url = "https://swapi.dev/api/people/1/"
+
+    while swapi_client.breaker_for(url).state == "closed":
+        with pytest.raises(HTTPException):
+            swapi_client.get_json(url)
+    assert len(calls) == swapi_client.SWAPI_BREAKER_FAILURES
+
+    # aberto: nenhuma ida ao upstream
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(swapi_client.aget_json(url))
+    assert exc.value.status_code == 503
+    assert len(calls) == swapi_client.SWAPI_BREAKER_FAILURES
+
+    # half-open: a chamada de teste passa e fecha o circuito
+    healthy[0] = True
+    now[0] += swapi_client.SWAPI_BREAKER_RESET_SECONDS
+    assert swapi_client.get_json(url) == {"name": "Luke Skywalker"}
+    assert swapi_client.breaker_for(url).state == "closed"
@@ -0,0 +1,103 @@
+import random
+
+import numpy as np
+import pytest
+
+from services import topk
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+@pytest.mark.parametrize("stop", [None, 0, 1, 5, 30, 5000])
+def test_sorted_prefix_equals_sorted_slice_including_ties(reverse, stop):
+    rnd = random.Random(42)
+    items = [{"id": i, "v": rnd.randint(0, 20)} for i in range(1000)]
+
+    def key(it):
+        return it["v"]
+
+    expected = sorted(items, key=key, reverse=reverse)[:stop]
+    assert topk.sorted_prefix(items, key, reverse, stop) == expected
+
+
+def test_filtered_sort_only_orders_the_requested_prefix(client, auth_off, mock_swapi, monkeypatch):
+    class Resp:
+        status_code = 200
+
+        def json(self):
+            people = [{"name": f"Person {i:03d}", "species": []} for i in range(200)]
+            return {"count": 200, "results": people, "next": None}
+
+    mock_swapi(lambda url, timeout=10: Resp())
+    seen = []
+    original = topk.sorted_prefix
+    monkeypatch.setattr(topk, "sorted_prefix", lambda *a: seen.append(a[3]) or original(*a))
+
+    res = client.get("/peoples/?q=person&sort=name&order=desc&page=2&limit=5")
+    assert [p["name"] for p in res.json()["results"]] == [f"Person {i:03d}" for i in range(194, 189, -1)]
+    assert res.json()["count"] == 200
+    assert seen == [10]
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+@pytest.mark.parametrize("n", [0, 1, 5, 30, 5000])
+def test_top_indices_equals_sorted_slice_including_ties(reverse, n):
+    rnd = random.Random(7)
+    values = np.array([float(rnd.randint(0, 20)) for _ in range(1000)])
+    candidates = np.array([i for i in range(1000) if i % 3], dtype=np.int64)
+
+    expected = sorted(candidates.tolist(), key=lambda i: values[i], reverse=reverse)[:n]
+    assert topk.top_indices(values, candidates, n, reverse).tolist() == expected
+
+
+def test_top_ranks_raw_and_derived_metrics(client, auth_off, mock_swapi):
+    vehicles = [
+        {"name": "Sand Crawler", "cost_in_credits": "150000", "passengers": "30", "max_atmosphering_speed": "30",
+         "url": "https://swapi.dev/api/vehicles/4/"},
+        {"name": "T-16 skyhopper", "cost_in_credits": "14500", "passengers": "1", "max_atmosphering_speed": "1200",
+         "url": "https://swapi.dev/api/vehicles/6/"},
+        {"name": "X-34 landspeeder", "cost_in_credits": "10550", "passengers": "1", "max_atmosphering_speed": "250",
+         "url": "https://swapi.dev/api/vehicles/7/"},
+        {"name": "TIE bomber", "cost_in_credits": "unknown", "passengers": "0", "max_atmosphering_speed": "850",
+         "url": "https://swapi.dev/api/vehicles/16/"},
+    ]
+
+    class Resp:
+        status_code = 200
+
+        def json(self):
+            return {"count": len(vehicles), "results": vehicles, "next": None}
+
+    mock_swapi(lambda url, timeout=10: Resp())
+
+    res = client.get("/top", params={"resource": "vehicles", "metric": "max_atmosphering_speed", "limit": 2})
+    assert res.status_code == 200
+    assert res.json()["results"] == [
+        {"id": 6, "name": "T-16 skyhopper", "url": "https://swapi.dev/api/vehicles/6/", "max_atmosphering_speed": 1200},
+        {"id": 16, "name": "TIE bomber", "url": "https://swapi.dev/api/vehicles/16/", "max_atmosphering_speed": 850},
+    ]
+
+    # sem custo ou sem passageiros o derivado é nulo e o item fica de fora
+    res = client.get("/top", params={"resource": "vehicles", "metric": "cost_per_passenger", "order": "asc"})
+    assert [(r["name"], r["cost_per_passenger"]) for r in res.json()["results"]] == [
+        ("Sand Crawler", 5000),
+        ("X-34 landspeeder", 10550),
+        ("T-16 skyhopper", 14500),
+    ]
+
+    res = client.get("/top", params={"resource": "vehicles", "metric": "cost_per_passenger", "filter": "passengers=1"})
+    assert [r["name"] for r in res.json()["results"]] == ["T-16 skyhopper", "X-34 landspeeder"]
+
+    assert client.get("/top", params={"resource": "vehicles", "metric": "nope"}).status_code == 400
+    assert client.get("/top", params={"resource": "vehicles", "metric": "name"}).status_code == 400
+
+
+def test_bmi_is_derived_at_ingestion():
+    from services import mirror
+
+    mirror.load({"people": [
+        {"name": "Luke", "height": "172", "mass": "77", "url": "https://swapi.dev/api/people/1/"},
+        {"name": "Jabba", "height": "175", "mass": "1,358", "url": "https://swapi.dev/api/people/16/"},
+        {"name": "Leia", "height": "150", "mass": "unknown", "url": "https://swapi.dev/api/people/5/"},
+    ]}, 1)
+
+    assert mirror.get("people").top("bmi", 10) == [(1, 443.4286), (0, 26.0276)]
@@ -1,4 +1,7 @@
-def test_vehicles_list_q_filter(client, auth_off, monkeypatch):
+import requests
+
+
+def test_vehicles_list_q_filter(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             def __init__(self, data):
@@ -11,8 +14,7 @@ def test_vehicles_list_q_filter(client, auth_off, monkeypatch):
             return Resp({"results": [{"name": "Sand Crawler"}, {"name": "Speeder Bike"}], "next": None})
         return Resp({})
 
-    import routers.vehicles_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/vehicles/?q=sand")
     assert res.status_code == 200
@@ -20,7 +22,7 @@ def test_vehicles_list_q_filter(client, auth_off, monkeypatch):
     assert res.json()["results"][0]["name"] == "Sand Crawler"
 
 
-def test_vehicles_expand_pilots_films(client, auth_off, monkeypatch):
+def test_vehicles_expand_pilots_films(client, auth_off, mock_swapi):
     def fake_get(url, timeout=10):
         class Resp:
             def __init__(self, data):
@@ -55,8 +57,7 @@ def test_vehicles_expand_pilots_films(client, auth_off, monkeypatch):
 
         return Resp({})
 
-    import routers.vehicles_router as mod
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
 
     res = client.get("/vehicles/4?expand=pilots,films")
     assert res.status_code == 200
@@ -65,15 +66,13 @@ def test_vehicles_expand_pilots_films(client, auth_off, monkeypatch):
     assert result["films"][0]["title"] == "A New Hope"
 
 
-def test_vehicles_upstream_timeout_502(client, auth_off, monkeypatch):
-    import routers.vehicles_router as mod
-
-    class FakeReqExc(mod.requests.RequestException):
+def test_vehicles_upstream_timeout_502(client, auth_off, mock_swapi):
+    class FakeReqExc(requests.RequestException):
         pass
 
     def fake_get(url, timeout=10):
         raise FakeReqExc("timeout")
 
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    mock_swapi(fake_get)
     res = client.get("/vehicles/")
     assert res.status_code == 502